@@ -1,10 +1,14 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from flask_socketio import SocketIO
 import os
 
 db = SQLAlchemy()
+socketio = SocketIO()
+live_updates = None
 
 def create_app():
+    global live_updates
     app = Flask(__name__)
     
     # Load configuration
@@ -33,5 +37,20 @@ def create_app():
     
     from app.routes import main
     app.register_blueprint(main)
+
+    # Push parking changes to dashboards instead of having them poll
+    socketio.init_app(app)
+    if live_updates is None:
+        from app.live_updates import LiveUpdateBroadcaster
+        from app.parking_state import parking_state
+        live_updates = LiveUpdateBroadcaster(socketio, parking_state)
+        live_updates.init_app()
+
+        # Keep an append-only log of occupancy changes and plate reads
+        from app.history import occupancy_history
+        occupancy_history.attach(parking_state)
+        # Utilisation, turnover and dwell aggregates for /api/parking/history
+        from app.rollups import occupancy_rollups
+        occupancy_rollups.attach(parking_state, occupancy_history)
     
     return app 
\ No newline at end of file
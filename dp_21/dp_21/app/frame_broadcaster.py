@@ -0,0 +1,58 @@
+import threading
+
+from metrics import STREAM_CLIENTS, STREAM_FRAMES_SENT
+
+
+class FrameBroadcaster:
+    """Share each encoded video frame with every /video_feed client.
+
+    The detection loop publishes a JPEG once; it is wrapped in its multipart
+    header a single time and tagged with a sequence number. Clients block
+    until a newer frame exists, so idle viewers cost nothing and slow
+    viewers simply skip to the latest frame instead of queueing.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.sequence = 0
+        self.frame = None
+        self.chunk = None
+
+    def publish(self, jpeg_bytes):
+        chunk = (b'--frame\r\n'
+                 b'Content-Type: image/jpeg\r\n\r\n' + jpeg_bytes + b'\r\n')
+        with self.condition:
+            self.frame = jpeg_bytes
+            self.chunk = chunk
+            self.sequence += 1
+            self.condition.notify_all()
+
+    def latest_frame(self):
+        with self.condition:
+            return self.frame
+
+    def wait_for_chunk(self, last_sequence, timeout=1.0):
+        """Block until a frame newer than last_sequence exists.
+
+        Returns (sequence, chunk); chunk is None if the timeout expired.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.sequence > last_sequence, timeout):
+                return last_sequence, None
+            return self.sequence, self.chunk
+
+    def stream(self):
+        """Multipart MJPEG generator for one client"""
+        sequence = 0
+        STREAM_CLIENTS.inc()
+        try:
+            while True:
+                sequence, chunk = self.wait_for_chunk(sequence)
+                if chunk is not None:
+                    STREAM_FRAMES_SENT.inc()
+                    yield chunk
+        finally:
+            STREAM_CLIENTS.dec()
+
+
+frame_broadcaster = FrameBroadcaster()
@@ -0,0 +1,204 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from metrics import HISTORY_EVENTS_DROPPED, HISTORY_EVENTS_WRITTEN, STAGE_SECONDS
+
+try:
+    from config import HISTORY_DB_PATH, HISTORY_BATCH_SIZE, HISTORY_FLUSH_SECONDS, HISTORY_QUEUE_SIZE
+except ImportError:
+    HISTORY_DB_PATH = os.path.join('instance', 'occupancy.db')
+    HISTORY_BATCH_SIZE = 500
+    HISTORY_FLUSH_SECONDS = 1.0
+    HISTORY_QUEUE_SIZE = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS occupancy_events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    camera TEXT NOT NULL,
+    spot INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    old_status TEXT,
+    status TEXT NOT NULL,
+    plate TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_spot_ts ON occupancy_events (camera, spot, ts);
+CREATE INDEX IF NOT EXISTS idx_events_plate_ts ON occupancy_events (plate, ts) WHERE plate IS NOT NULL;
+"""
+
+INSERT = ("INSERT INTO occupancy_events (ts, camera, spot, kind, old_status, status, plate) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+EVENT_COLUMNS = ('ts', 'camera', 'spot', 'kind', 'old_status', 'status', 'plate')
+
+
+class OccupancyHistory:
+    """Append-only log of spot transitions and plate reads in SQLite.
+
+    ParkingState listeners only put a tuple on a bounded queue; a single
+    writer thread drains it and inserts whole batches with executemany in
+    one transaction. The database runs in WAL mode so history queries from
+    the web app read concurrently with the writer. If the queue is full the
+    event is dropped and counted rather than blocking the detection loop.
+    """
+
+    def __init__(self, db_path=HISTORY_DB_PATH, batch_size=HISTORY_BATCH_SIZE,
+                 flush_interval=HISTORY_FLUSH_SECONDS, queue_size=HISTORY_QUEUE_SIZE):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.last_plates = {}
+        self.local = threading.local()
+        self.thread = None
+        self.start_lock = threading.Lock()
+        self.stopped = False
+
+    def _connect(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def connect(self):
+        """New connection to the history database, e.g. for the rollup checkpoints"""
+        return self._connect()
+
+    def start(self):
+        with self.start_lock:
+            if self.thread is not None:
+                return self
+            conn = self._connect()
+            conn.executescript(SCHEMA)
+            conn.close()
+            self.thread = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+            self.thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def attach(self, state):
+        """Log every confirmed change of a ParkingState, tagged with its camera"""
+        self.start()
+        state.add_listener(lambda *transition: self.record(state.camera_id, *transition))
+
+    def record(self, camera_id, spot_num, old_status, new_status, plate):
+        """ParkingState listener: queue one event without touching the disk"""
+        key = (camera_id, spot_num)
+        if old_status == new_status:
+            kind = 'plate'
+        elif new_status == 'occupied':
+            kind = 'arrival'
+        else:
+            kind = 'departure'
+            # The state has already cleared the plate; log who left
+            plate = plate or self.last_plates.get(key)
+        if new_status == 'occupied':
+            self.last_plates[key] = plate
+        else:
+            self.last_plates.pop(key, None)
+        try:
+            self.queue.put_nowait((time.time(), camera_id, spot_num, kind, old_status, new_status, plate))
+        except queue.Full:
+            HISTORY_EVENTS_DROPPED.inc()
+
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                try:
+                    first = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    if self.stopped:
+                        return
+                    continue
+                if first is None:
+                    return
+                batch = [first]
+                while len(batch) < self.batch_size:
+                    try:
+                        event = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if event is None:
+                        self.stopped = True
+                        break
+                    batch.append(event)
+                self._write(conn, batch)
+                if self.stopped and self.queue.empty():
+                    return
+        finally:
+            conn.close()
+
+    def _write(self, conn, batch):
+        try:
+            with STAGE_SECONDS.time(stage='history_write'):
+                with conn:
+                    conn.executemany(INSERT, batch)
+            HISTORY_EVENTS_WRITTEN.inc(len(batch))
+        except sqlite3.Error as e:
+            print(f"Error writing occupancy history: {e}")
+            HISTORY_EVENTS_DROPPED.inc(len(batch))
+
+    def stop(self, timeout=5.0):
+        """Flush queued events and stop the writer"""
+        if self.thread is None or not self.thread.is_alive():
+            return
+        self.stopped = True
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+
+    def _reader(self):
+        # One read connection per thread; WAL readers don't block the writer
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+        return conn
+
+    def _query_rows(self, sql, params):
+        if not os.path.exists(self.db_path):
+            return []
+        return self._reader().execute(sql, params).fetchall()
+
+    def _query(self, sql, params):
+        return [dict(zip(EVENT_COLUMNS, row)) for row in self._query_rows(sql, params)]
+
+    def spot_timeline(self, spot_num, camera_id='cam1', since=None, until=None, limit=1000):
+        """Occupancy events of one spot in time order, optionally within [since, until)"""
+        return self._query(
+            "SELECT ts, camera, spot, kind, old_status, status, plate FROM occupancy_events "
+            "WHERE camera = ? AND spot = ? AND ts >= ? AND ts < ? ORDER BY ts LIMIT ?",
+            (camera_id, spot_num, since or 0.0, until or float('inf'), limit))
+
+    def events_since(self, since, camera_id, until=None, batch=5000):
+        """Yield a camera's events in [since, until), oldest first, a batch at a time"""
+        last_id = 0
+        while True:
+            rows = self._query_rows(
+                "SELECT id, ts, camera, spot, kind, old_status, status, plate FROM occupancy_events "
+                "WHERE camera = ? AND ts >= ? AND ts < ? AND id > ? ORDER BY id LIMIT ?",
+                (camera_id, since, until or float('inf'), last_id, batch))
+            for row in rows:
+                yield dict(zip(EVENT_COLUMNS, row[1:]))
+            if len(rows) < batch:
+                return
+            last_id = rows[-1][0]
+
+    def plate_sightings(self, plate, since=None, until=None, limit=1000):
+        """Every arrival, departure and read of a plate, newest first"""
+        return self._query(
+            "SELECT ts, camera, spot, kind, old_status, status, plate FROM occupancy_events "
+            "WHERE plate = ? AND ts >= ? AND ts < ? ORDER BY ts DESC LIMIT ?",
+            (plate, since or 0.0, until or float('inf'), limit))
+
+
+occupancy_history = OccupancyHistory()
@@ -0,0 +1,147 @@
+import json
+import math
+import threading
+import numpy as np
+
+from metrics import INGEST_BATCHES, STAGE_SECONDS
+from app.spot_store import normalise_spot_id
+from detection.plate_text import clean_plate_text, is_valid_plate
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+MAX_ID_LENGTH = 64
+
+
+class IngestError(ValueError):
+    pass
+
+
+def decode_payload(body, content_type):
+    """Parse an ingest request body sent as JSON or msgpack"""
+    content_type = (content_type or '').split(';')[0].strip()
+    if content_type in MSGPACK_TYPES:
+        if msgpack is None:
+            raise IngestError("msgpack is not installed on the server; send JSON instead")
+        return msgpack.unpackb(body, raw=False, strict_map_key=False)
+    try:
+        return json.loads(body)
+    except ValueError as e:
+        raise IngestError(f"Invalid JSON: {e}")
+
+
+class DeltaIngestor:
+    """Apply batched per-spot deltas from remote detectors to a ParkingState.
+
+    A request carries one or more batches:
+
+        {"batches": [{"source": "edge-1", "session": "...", "seq": 42,
+                      "updates": [[spot, occupied, confidence, plate], ...]}]}
+
+    confidence and plate are optional; spot is an integer or a short string
+    id, and plates that don't look like a plate are dropped. Malformed
+    input raises IngestError. Each source numbers its batches; a batch
+    whose seq is not newer than the last one applied for that source and
+    session is acknowledged but skipped, so clients can safely retry. A new
+    session (e.g. a restarted detector) starts counting again. Remote
+    detectors debounce on their side, so deltas are applied as-is.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def ingest(self, payload):
+        if not isinstance(payload, dict):
+            raise IngestError("Payload must be an object")
+        batches = payload.get('batches')
+        if batches is None:
+            batches = [payload]
+        if not isinstance(batches, list):
+            raise IngestError("batches must be a list")
+
+        # Later updates to the same spot replace earlier ones in this request
+        merged = {}
+        applied, duplicates = [], []
+        with self.lock:
+            sessions = dict(self.sessions)
+            for batch in batches:
+                source, seq = self._check(batch)
+                session = batch.get('session')
+                last = sessions.get(source)
+                if last is not None and last[0] == session and seq <= last[1]:
+                    duplicates.append({'source': source, 'seq': seq})
+                    continue
+                updates = batch.get('updates', [])
+                if not isinstance(updates, list):
+                    raise IngestError(f"updates from {source} must be a list")
+                for update in updates:
+                    spot_num, occupied, confidence, plate = self._parse(update, source)
+                    merged[spot_num] = (occupied, confidence, plate)
+                sessions[source] = (session, seq)
+                applied.append({'source': source, 'seq': seq})
+
+            if merged:
+                with STAGE_SECONDS.time(stage='ingest_apply'):
+                    self._apply(merged)
+            # Only remember sequence numbers once their updates are in
+            self.sessions = sessions
+
+        INGEST_BATCHES.inc(len(applied), result='applied')
+        INGEST_BATCHES.inc(len(duplicates), result='duplicate')
+        return {'applied': applied, 'duplicates': duplicates, 'spots': len(merged)}
+
+    def _check(self, batch):
+        if not isinstance(batch, dict):
+            raise IngestError("Each batch must be an object")
+        source, seq = batch.get('source'), batch.get('seq')
+        if not isinstance(source, str) or not source or len(source) > MAX_ID_LENGTH:
+            raise IngestError("Each batch needs a source string")
+        if isinstance(seq, bool) or not isinstance(seq, int) or not INT64_MIN <= seq <= INT64_MAX:
+            raise IngestError("Each batch needs an integer seq")
+        session = batch.get('session')
+        if session is not None and (not isinstance(session, (str, int)) or len(str(session)) > MAX_ID_LENGTH):
+            raise IngestError("session must be a short string")
+        return source, seq
+
+    def _parse(self, update, source):
+        """[spot, occupied, confidence?, plate?] -> (spot, occupied, confidence, plate)"""
+        if not isinstance(update, (list, tuple)) or not 2 <= len(update) <= 4:
+            raise IngestError(f"Bad update {update!r} from {source}")
+        spot_num, occupied = update[0], update[1]
+        confidence = update[2] if len(update) > 2 and update[2] is not None else 1.0
+        plate = update[3] if len(update) > 3 else None
+
+        if isinstance(spot_num, bool) or not isinstance(spot_num, (int, str)):
+            raise IngestError(f"Bad spot id {spot_num!r} from {source}")
+        if isinstance(spot_num, int) and not INT64_MIN <= spot_num <= INT64_MAX:
+            raise IngestError(f"Spot id {spot_num!r} from {source} is out of range")
+        if isinstance(spot_num, str) and not 0 < len(spot_num) <= MAX_ID_LENGTH:
+            raise IngestError(f"Bad spot id {spot_num!r} from {source}")
+        if occupied not in (True, False, 0, 1):
+            raise IngestError(f"occupied must be a boolean, got {occupied!r} from {source}")
+        if isinstance(confidence, bool) or not isinstance(confidence, (int, float)) \
+                or not math.isfinite(confidence):
+            raise IngestError(f"Bad confidence {confidence!r} from {source}")
+        if plate is not None and not isinstance(plate, str):
+            raise IngestError(f"plate must be a string, got {plate!r} from {source}")
+
+        # Plates end up on the dashboard, so only keep ones that look like a plate
+        if plate:
+            plate = clean_plate_text(plate)
+        if not plate or not is_valid_plate(plate):
+            plate = None
+        return normalise_spot_id(spot_num), bool(occupied), float(confidence), plate
+
+    def _apply(self, merged):
+        spot_ids = list(merged.keys())
+        occupied = np.array([update[0] for update in merged.values()], dtype=bool)
+        confidences = np.array([update[1] for update in merged.values()], dtype=np.float32)
+        plates = {spot_num: update[2] for spot_num, update in merged.items() if update[2]}
+        return self.state.update_spots_from_arrays(spot_ids, occupied, confidences, plates, smooth=False)
@@ -0,0 +1,82 @@
+import threading
+from flask_socketio import emit
+
+from metrics import SOCKET_EMITS
+
+
+class LiveUpdateBroadcaster:
+    """Push parking changes to browsers over Socket.IO.
+
+    Clients get a full snapshot when they connect and then per-spot deltas.
+    Both carry ParkingSnapshot versions; a delta covers every change after
+    its 'since' version, so a client whose version is older than that has
+    missed one. Changes are coalesced on the server, so a burst of
+    transitions within one flush interval becomes a single message that is
+    sent once to all connected dashboards.
+    """
+
+    def __init__(self, socketio, state, flush_interval=0.1):
+        self.socketio = socketio
+        self.state = state
+        self.flush_interval = flush_interval
+        # Snapshot version the last delta brought clients up to
+        self.flushed_version = state.get_snapshot().version
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.task = None
+
+    def init_app(self):
+        self.socketio.on_event('connect', self.on_connect)
+        self.socketio.on_event('request_snapshot', self.on_connect)
+        self.state.add_listener(self.on_transition)
+
+    def snapshot(self):
+        snapshot = self.state.get_snapshot()
+        status = dict(snapshot.status)
+        status['version'] = snapshot.version
+        return status
+
+    def on_connect(self, *args):
+        # Sent only to the client that connected or asked to resync
+        emit('parking_snapshot', self.snapshot())
+        SOCKET_EMITS.inc(event='parking_snapshot')
+
+    def on_transition(self, spot_num, old_status, new_status, plate):
+        self.queue_spot(spot_num, new_status, plate)
+
+    def queue_spot(self, spot_num, status, plate):
+        """Record a spot change; later changes to the same spot replace earlier ones"""
+        with self.lock:
+            self.pending[spot_num] = {'id': spot_num, 'status': status, 'plate': plate}
+            if self.task is None:
+                self.task = self.socketio.start_background_task(self._flush_loop)
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return False
+            spots = list(self.pending.values())
+            self.pending = {}
+            # Transitions are published before listeners hear of them, so
+            # this snapshot already includes every pending change
+            snapshot = self.state.get_snapshot()
+            since = self.flushed_version
+            self.flushed_version = max(since, snapshot.version)
+        self.socketio.emit('parking_delta', {
+            'since': since,
+            'version': snapshot.version,
+            'total_spots': snapshot.total_spots,
+            'available': snapshot.available,
+            'occupied': snapshot.occupied,
+            'spots': spots,
+        })
+        SOCKET_EMITS.inc(event='parking_delta')
+        return True
+
+    def _flush_loop(self):
+        while True:
+            self.socketio.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error pushing parking update: {e}")
@@ -1,77 +1,254 @@
 from threading import Lock
+import json
 import threading
-import pytesseract
-from PIL import Image
-import cv2
+import time
 import numpy as np
 
+from app.spot_store import SpotStore, OCCUPIED, STATUS_NAMES, normalise_spot_id
+
+try:
+    from config import (OCCUPANCY_WINDOW, OCCUPANCY_VOTES, OCCUPY_DWELL_SECONDS,
+                        VACATE_DWELL_SECONDS, OCCUPANCY_EMA_ALPHA)
+except ImportError:
+    OCCUPANCY_WINDOW = 5
+    OCCUPANCY_VOTES = 3
+    OCCUPY_DWELL_SECONDS = 1.0
+    VACATE_DWELL_SECONDS = 2.0
+    OCCUPANCY_EMA_ALPHA = 0.4
+
+class ParkingSnapshot:
+    """Immutable view of the parking state at one version.
+
+    Holds its own copy of the status and plate columns; the dict and JSON
+    forms are built on first use and cached, so publishing a change costs
+    two array copies however many spots there are. Nothing in a snapshot is
+    modified once readers can see it, and callers must not mutate it.
+    """
+
+    __slots__ = ('version', 'ids', 'index', 'status_codes', 'plate_ids', 'plates',
+                 'total_spots', 'available', 'occupied', 'etag',
+                 '_spots', '_status', '_body', '_spots_body')
+
+    def __init__(self, version, store):
+        self.version = version
+        self.ids = store.ids
+        self.index = store.index
+        self.status_codes = store.status.copy()
+        self.plate_ids = store.plate_ids.copy()
+        self.plates = store.plates
+        self.total_spots = len(store)
+        self.available = store.available
+        self.occupied = store.occupied
+        self.etag = f'"{version}"'
+        self._spots = None
+        self._status = None
+        self._body = None
+        self._spots_body = None
+
+    def _spot(self, row):
+        return {'status': STATUS_NAMES[self.status_codes[row]],
+                'plate': self.plates.name(self.plate_ids[row])}
+
+    def get_spot(self, spot_num):
+        row = self.index.get(normalise_spot_id(spot_num))
+        return None if row is None else self._spot(row)
+
+    @property
+    def spots(self):
+        """{spot_id: {'status', 'plate'}} for every spot"""
+        if self._spots is None:
+            self._spots = {spot_id: self._spot(row) for row, spot_id in enumerate(self.ids)}
+        return self._spots
+
+    @property
+    def status(self):
+        if self._status is None:
+            self._status = {
+                'total_spots': self.total_spots,
+                'available': self.available,
+                'occupied': self.occupied,
+                'spots': [{'id': i, **spot} for i, spot in self.spots.items()],
+            }
+        return self._status
+
+    @property
+    def body(self):
+        """get_status() serialised to JSON, once per version"""
+        if self._body is None:
+            self._body = json.dumps(self.status)
+        return self._body
+
+    def spots_body(self):
+        """JSON of the {spot_id: spot} mapping, serialised on first use"""
+        if self._spots_body is None:
+            self._spots_body = json.dumps(self.spots)
+        return self._spots_body
+
+
 class ParkingState:
-    def __init__(self):
-        self.spots = {i: {'status': 'empty', 'plate': None} for i in range(1, 13)}
+    """Spot occupancy with a single writer lock and lock-free readers.
+
+    Spots live in a columnar SpotStore. Writers update it under the lock
+    and then publish a new ParkingSnapshot with a higher version. Readers
+    only dereference self.snapshot, so dashboard requests never wait on the
+    detection loop.
+    """
+
+    def __init__(self, spot_ids=None, camera_id='cam1'):
+        self.camera_id = camera_id
+        self.listeners = []
         self.lock = threading.Lock()
-        self.available = 12
-        self.occupied = 0
         self.last_update = None
+        self.version = 0
+        self.snapshot = None
+        self.reset_spots(spot_ids)
 
-    def update_spots_from_detection(self, detections):
-        """Update spots based on model detections"""
+    def reset_spots(self, spot_ids=None):
+        """Replace the spot layout, e.g. with the ids of a camera's spot map"""
+        if spot_ids is None:
+            spot_ids = range(1, 13)
         with self.lock:
-            # Reset counts
-            self.available = 12
-            self.occupied = 0
-            
-            # Update based on detections
-            for spot_num, data in detections.items():
-                if spot_num in self.spots:
-                    if isinstance(data, dict):
-                        self.spots[spot_num]['status'] = data.get('status', 'empty')
-                        if 'plate' in data and data['plate']:
-                            self.spots[spot_num]['plate'] = data['plate']
-                        elif data.get('status') == 'empty':
-                            self.spots[spot_num]['plate'] = None
-                        
-                        # Count occupied spots
-                        if data.get('status') == 'occupied':
-                            self.occupied += 1
-                            self.available -= 1
-                    else:
-                        # Handle string format (backwards compatibility)
-                        self.spots[spot_num]['status'] = data
-                        if data == 'empty':
-                            self.spots[spot_num]['plate'] = None
-                        # Count occupied spots (for string data)
-                        elif data == 'occupied':
-                            self.occupied += 1
-                            self.available -= 1
+            self.store = SpotStore(spot_ids, window=OCCUPANCY_WINDOW, votes=OCCUPANCY_VOTES,
+                                   occupy_dwell=OCCUPY_DWELL_SECONDS, vacate_dwell=VACATE_DWELL_SECONDS,
+                                   alpha=OCCUPANCY_EMA_ALPHA)
+            self._publish()
 
-    def get_spot_status(self, spot_num):
+    @property
+    def spot_ids(self):
+        return self.store.ids
+
+    @property
+    def occupied(self):
+        return self.store.occupied
+
+    @property
+    def available(self):
+        return self.store.available
+
+    def add_listener(self, callback):
+        """Register callback(spot_num, old_status, new_status, plate) for confirmed changes.
+
+        Plate updates on an occupied spot are reported with old_status == new_status.
+        """
+        self.listeners.append(callback)
+
+    def _notify(self, transitions):
+        for transition in transitions:
+            for listener in self.listeners:
+                try:
+                    listener(*transition)
+                except Exception as e:
+                    print(f"Error in parking state listener: {e}")
+
+    def _publish(self):
+        """Swap in a new snapshot; call with the lock held after a change"""
+        self.version += 1
+        self.snapshot = ParkingSnapshot(self.version, self.store)
+
+    def update_spots_from_detection(self, detections, smooth=True):
+        """Update spots from a {spot_num: status or {'status', 'plate', 'confidence'}} dict.
+
+        See update_spots_from_arrays; ids not in the layout are ignored.
+        """
+        spot_ids, occupied, confidences, plates = [], [], [], {}
+        for spot_num, data in detections.items():
+            if isinstance(data, dict):
+                status = data.get('status', 'empty')
+                confidence = data.get('confidence', 1.0)
+                if data.get('plate'):
+                    plates[spot_num] = data['plate']
+            else:
+                # Handle string format (backwards compatibility)
+                status, confidence = data, 1.0
+            spot_ids.append(spot_num)
+            occupied.append(status == 'occupied')
+            confidences.append(confidence)
+        return self.update_spots_from_arrays(spot_ids, occupied, confidences, plates, smooth=smooth)
+
+    def update_spots_from_arrays(self, spot_ids, occupied, confidences, plates=None, smooth=True):
+        """Apply one batch of observations given as parallel arrays.
+
+        spot_ids must be unique. With smooth=True each observation goes
+        through the spot's debounce state and only confirmed transitions
+        change the spot; otherwise the observations are applied as-is.
+        plates maps spot ids to plates read for them this frame. Returns the
+        confirmed (spot_num, old_status, new_status, plate) transitions.
+        """
+        now = time.time()
+        plates = plates or {}
         with self.lock:
-            return self.spots.get(spot_num, {'status': 'unknown', 'plate': None})
+            store = self.store
+            rows, valid = store.rows(spot_ids)
+            rows = rows[valid]
+            occupied = np.asarray(occupied, dtype=bool)[valid]
+            confidences = np.broadcast_to(np.asarray(confidences, dtype=np.float32), valid.shape)[valid]
+            if smooth:
+                changed = store.observe(rows, occupied, confidences, now)
+            else:
+                changed = store.force(rows, occupied, now, confidences)
 
-    def get_all_spots(self):
+            changed_plates = False
+            for spot_num, plate in plates.items():
+                row = store.row(spot_num)
+                if row is not None and store.status[row] == OCCUPIED:
+                    changed_plates |= store.set_plate(row, plate)
+
+            transitions = []
+            for row in changed:
+                new_status = STATUS_NAMES[store.status[row]]
+                old_status = STATUS_NAMES[1 - store.status[row]]
+                transitions.append((store.ids[row], old_status, new_status,
+                                    store.plates.name(store.plate_ids[row])))
+
+            self.last_update = now
+            if transitions or changed_plates:
+                self._publish()
+
+        self._notify(transitions)
+        return transitions
+
+    def set_spot_plate(self, spot_num, plate):
+        """Attach a plate to a confirmed occupied spot; returns True if stored"""
         with self.lock:
-            return self.spots.copy()
+            row = self.store.row(spot_num)
+            if row is None or self.store.status[row] != OCCUPIED:
+                return False
+            changed = self.store.set_plate(row, plate)
+            if changed:
+                self._publish()
+        if changed:
+            self._notify([(spot_num, 'occupied', 'occupied', plate)])
+        return True
+
+    def get_snapshot(self):
+        """Current ParkingSnapshot; read without taking the writer lock"""
+        return self.snapshot
+
+    def get_spot_status(self, spot_num):
+        return self.snapshot.get_spot(spot_num) or {'status': 'unknown', 'plate': None}
+
+    def get_all_spots(self):
+        return self.snapshot.spots
 
     def get_status(self):
-        with self.lock:
-            return {
-                'total_spots': 12,
-                'available': self.available,
-                'occupied': self.occupied,
-                'spots': [{'id': i, 'status': self.spots[i]['status'], 'plate': self.spots[i]['plate']} for i in range(1, 13)]
-            }
+        # Shallow copy so callers can add keys (e.g. a version) to the response
+        return dict(self.snapshot.status)
 
     def update_spots_from_image(self, image):
         """Update spots based on OCR detection from the image."""
+        # Imported here so the web app can load this module without OpenCV or OCR
+        import cv2
+        from detection.registry import models
         # Convert the image to grayscale
         gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         # Apply thresholding to get a binary image
         _, binary_image = cv2.threshold(gray_image, 150, 255, cv2.THRESH_BINARY_INV)
 
-        # Use Tesseract to do OCR on the processed image
-        detected_text = pytesseract.image_to_string(binary_image, config='--psm 6')
+        # OCR the processed image with the cheapest tier that reads anything
+        detected_text = models.ocr_engine().read_text(binary_image, psm=6)
 
         # Process detected text to update parking spots
+        spot_ids, plates = [], {}
         for line in detected_text.splitlines():
             if line.strip():  # Check if the line is not empty
                 # Assuming the format is "Spot X: Plate Y"
@@ -79,12 +256,13 @@ class ParkingState:
                 if len(parts) == 2:
                     spot_num = int(parts[0].replace('Spot', '').strip())
                     plate = parts[1].strip()
-                    if spot_num in self.spots:
-                        self.spots[spot_num]['status'] = 'occupied'
-                        self.spots[spot_num]['plate'] = plate
-                        self.occupied += 1
-                        self.available -= 1
+                    if self.store.row(spot_num) is not None:
+                        spot_ids.append(spot_num)
+                        plates[spot_num] = plate
                     else:
                         print(f"Spot number {spot_num} is out of range.")
+        if spot_ids:
+            self.update_spots_from_arrays(spot_ids, np.ones(len(spot_ids), dtype=bool), 1.0,
+                                          plates, smooth=False)
 
 parking_state = ParkingState() 
\ No newline at end of file
@@ -0,0 +1,428 @@
+import atexit
+import bisect
+import itertools
+import json
+import sqlite3
+import threading
+import time
+
+from metrics import STAGE_SECONDS
+
+try:
+    from config import ROLLUP_MINUTES_KEPT, ROLLUP_HOURS_KEPT, ROLLUP_DAYS_KEPT, ROLLUP_CHECKPOINT_SECONDS
+except ImportError:
+    ROLLUP_MINUTES_KEPT = 1440
+    ROLLUP_HOURS_KEPT = 720
+    ROLLUP_DAYS_KEPT = 365
+    ROLLUP_CHECKPOINT_SECONDS = 60.0
+
+GRANULARITIES = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Upper bounds (seconds) of the dwell-time histogram bins; the last is open-ended
+DWELL_BINS = (300, 900, 1800, 3600, 7200, 14400, 28800, 86400, float('inf'))
+DWELL_LABELS = ('5m', '15m', '30m', '1h', '2h', '4h', '8h', '24h', '+Inf')
+
+LOT = 'lot'
+
+# Checkpoint tables, kept in the history database; scopes and spots are stored as JSON
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS occupancy_rollups (
+    camera TEXT NOT NULL,
+    granularity TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    scope TEXT NOT NULL,
+    occupied_seconds REAL NOT NULL,
+    arrivals INTEGER NOT NULL,
+    departures INTEGER NOT NULL,
+    PRIMARY KEY (camera, granularity, start, scope)
+);
+CREATE TABLE IF NOT EXISTS occupancy_dwell (
+    camera TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    counts TEXT NOT NULL,
+    PRIMARY KEY (camera, scope)
+);
+CREATE TABLE IF NOT EXISTS occupancy_open (
+    camera TEXT NOT NULL,
+    spot TEXT NOT NULL,
+    since REAL NOT NULL,
+    PRIMARY KEY (camera, spot)
+);
+CREATE TABLE IF NOT EXISTS rollup_checkpoints (
+    camera TEXT PRIMARY KEY,
+    ts REAL NOT NULL
+);
+"""
+
+
+class Bucket:
+    __slots__ = ('occupied_seconds', 'arrivals', 'departures')
+
+    def __init__(self):
+        self.occupied_seconds = 0.0
+        self.arrivals = 0
+        self.departures = 0
+
+
+class RollupSeries:
+    """Fixed-width time buckets for one granularity, keeping the newest `keep`"""
+
+    def __init__(self, width, keep):
+        self.width = width
+        self.keep = keep
+        # bucket start -> {scope: Bucket}, scope is LOT or a spot id
+        self.buckets = {}
+        self.newest = None
+        # (start, scope) of buckets changed since the last checkpoint
+        self.dirty = set()
+
+    def start_of(self, ts):
+        return int(ts // self.width) * self.width
+
+    def bucket(self, ts, scope):
+        start = self.start_of(ts)
+        scopes = self.buckets.get(start)
+        if scopes is None:
+            if self.newest is None or start > self.newest:
+                self.newest = start
+                oldest = start - (self.keep - 1) * self.width
+                for expired in [key for key in self.buckets if key < oldest]:
+                    del self.buckets[expired]
+            elif start <= self.newest - self.keep * self.width:
+                # Older than the retention window; count it nowhere
+                return Bucket()
+            scopes = self.buckets[start] = {}
+        entry = scopes.get(scope)
+        if entry is None:
+            entry = scopes[scope] = Bucket()
+        self.dirty.add((start, scope))
+        return entry
+
+    def oldest_kept(self):
+        return None if self.newest is None else self.newest - (self.keep - 1) * self.width
+
+    def merge(self, start, scope, occupied_seconds, arrivals, departures):
+        """Add checkpointed totals to a bucket; it stays clean unless live updates touched it too"""
+        touched = (start, scope) in self.dirty
+        entry = self.bucket(start, scope)
+        entry.occupied_seconds += occupied_seconds
+        entry.arrivals += arrivals
+        entry.departures += departures
+        if not touched:
+            self.dirty.discard((start, scope))
+
+    def accrue(self, scope, start, end):
+        """Spread the occupied interval [start, end) over the buckets it covers"""
+        start = max(start, end - self.width * self.keep)
+        while start < end:
+            bucket_end = self.start_of(start) + self.width
+            overlap = min(end, bucket_end) - start
+            self.bucket(start, scope).occupied_seconds += overlap
+            self.bucket(start, LOT).occupied_seconds += overlap
+            start = bucket_end
+
+
+class CameraRollup:
+    def __init__(self, state):
+        self.state = state
+        self.series = {name: RollupSeries(width, keep) for (name, width), keep in zip(
+            GRANULARITIES.items(), (ROLLUP_MINUTES_KEPT, ROLLUP_HOURS_KEPT, ROLLUP_DAYS_KEPT))}
+        self.occupied_since = {}
+        self.dwell = {LOT: [0] * len(DWELL_BINS)}
+        # Until the checkpoint is loaded nothing may be written back
+        self.loaded = False
+        self.restored_at = None
+        # Spots with a live transition before loading finished
+        self.live_spots = set()
+        # Spots still parked at the last checkpoint, not yet seen again
+        self.restored = set()
+
+
+class OccupancyRollups:
+    """Incremental per-spot and per-lot occupancy aggregates.
+
+    Each confirmed transition updates minute, hour and day buckets of
+    occupied seconds, arrivals (turnover) and departures, plus dwell-time
+    histograms. Only a bounded number of buckets is kept per granularity, so
+    a query costs the same however long the system has been running; time
+    still accruing for cars that are parked right now is added at query
+    time. Buckets are aligned to UTC.
+
+    With an OccupancyHistory, changed buckets, dwell histograms and parked
+    cars are checkpointed to its database every checkpoint_interval
+    seconds. A restart loads the checkpoint and replays only the events
+    logged after it, in a background thread.
+    """
+
+    def __init__(self, checkpoint_interval=ROLLUP_CHECKPOINT_SECONDS):
+        self.cameras = {}
+        self.lock = threading.Lock()
+        self.event_log = None
+        self.checkpoint_interval = checkpoint_interval
+        self.thread = None
+        self.start_lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def retention_seconds(self):
+        return max(width * keep for width, keep in zip(
+            GRANULARITIES.values(), (ROLLUP_MINUTES_KEPT, ROLLUP_HOURS_KEPT, ROLLUP_DAYS_KEPT)))
+
+    def attach(self, state, history=None):
+        """Feed a ParkingState's transitions into the rollups.
+
+        With an OccupancyHistory, the last checkpoint and the events logged
+        since are loaded in the background so aggregates survive a restart;
+        queries answer from what is loaded so far meanwhile.
+        """
+        with self.lock:
+            rollup = self.cameras[state.camera_id] = CameraRollup(state)
+            rollup.loaded = history is None
+        state.add_listener(lambda *transition: self.record(state.camera_id, *transition))
+        if history is None:
+            return
+        self.event_log = history
+        thread = threading.Thread(target=self._restore, args=(rollup, state.camera_id, history, time.time()),
+                                  name=f'rollups-restore-{state.camera_id}', daemon=True)
+        thread.start()
+        self.start()
+
+    def record(self, camera_id, spot_num, old_status, new_status, plate, now=None):
+        # Plate reads arrive with old == new and don't change occupancy
+        if old_status == new_status:
+            return
+        now = time.time() if now is None else now
+        with self.lock:
+            rollup = self.cameras.get(camera_id)
+            if rollup is None:
+                return
+            if not rollup.loaded:
+                rollup.live_spots.add(spot_num)
+            self._apply(rollup, spot_num, new_status, now, rollup.occupied_since)
+
+    def _apply(self, rollup, spot_num, new_status, now, occupied_since):
+        """Count one transition; call with the lock held"""
+        if new_status == 'occupied':
+            if spot_num in rollup.restored:
+                # The car parked before the restart is still there
+                rollup.restored.discard(spot_num)
+                return
+            occupied_since[spot_num] = now
+            for series in rollup.series.values():
+                series.bucket(now, spot_num).arrivals += 1
+                series.bucket(now, LOT).arrivals += 1
+            return
+
+        rollup.restored.discard(spot_num)
+        for series in rollup.series.values():
+            series.bucket(now, spot_num).departures += 1
+            series.bucket(now, LOT).departures += 1
+        since = occupied_since.pop(spot_num, None)
+        if since is None:
+            return
+        for series in rollup.series.values():
+            series.accrue(spot_num, since, now)
+        index = bisect.bisect_left(DWELL_BINS, now - since)
+        rollup.dwell[LOT][index] += 1
+        rollup.dwell.setdefault(spot_num, [0] * len(DWELL_BINS))[index] += 1
+
+    def _restore(self, rollup, camera_id, history, until, chunk=5000):
+        """Load a camera's checkpoint, then replay the events logged between it and until"""
+        started = time.perf_counter()
+        occupied_since = {}
+        replayed = 0
+        try:
+            conn = history.connect()
+            try:
+                conn.executescript(SCHEMA)
+                row = conn.execute("SELECT ts FROM rollup_checkpoints WHERE camera = ?", (camera_id,)).fetchone()
+                checkpoint = row[0] if row else None
+                cursor = conn.execute(
+                    "SELECT granularity, start, scope, occupied_seconds, arrivals, departures "
+                    "FROM occupancy_rollups WHERE camera = ?", (camera_id,))
+                while True:
+                    rows = cursor.fetchmany(chunk)
+                    if not rows:
+                        break
+                    # Let live updates in between chunks
+                    with self.lock:
+                        for granularity, start, scope, occupied_seconds, arrivals, departures in rows:
+                            series = rollup.series.get(granularity)
+                            if series is not None:
+                                series.merge(start, json.loads(scope), occupied_seconds, arrivals, departures)
+                dwell = conn.execute("SELECT scope, counts FROM occupancy_dwell WHERE camera = ?",
+                                     (camera_id,)).fetchall()
+                with self.lock:
+                    for scope, counts in dwell:
+                        totals = rollup.dwell.setdefault(json.loads(scope), [0] * len(DWELL_BINS))
+                        for index, count in enumerate(json.loads(counts)[:len(DWELL_BINS)]):
+                            totals[index] += count
+                for spot, since in conn.execute("SELECT spot, since FROM occupancy_open WHERE camera = ?",
+                                                (camera_id,)):
+                    occupied_since[json.loads(spot)] = since
+            finally:
+                conn.close()
+
+            since = until - self.retention_seconds()
+            if checkpoint is not None:
+                since = max(since, checkpoint)
+            for event in history.events_since(since, camera_id=camera_id, until=until):
+                if event['old_status'] == event['status']:
+                    continue
+                with self.lock:
+                    self._apply(rollup, event['spot'], event['status'], event['ts'], occupied_since)
+                replayed += 1
+        except sqlite3.Error as e:
+            print(f"Error restoring occupancy rollups for {camera_id}: {e}")
+
+        with self.lock:
+            # Cars parked across the restart keep their arrival time unless the
+            # live state has already moved on for that spot
+            for spot_num, since in occupied_since.items():
+                if spot_num not in rollup.live_spots:
+                    rollup.occupied_since[spot_num] = since
+                    rollup.restored.add(spot_num)
+            rollup.loaded = True
+            rollup.restored_at = time.time()
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage='rollup_restore')
+        print(f"Restored occupancy rollups for {camera_id}: replayed {replayed} events in {elapsed:.1f}s")
+
+    def _forget_departed(self, rollup, now):
+        """Spots restored as parked but not occupied once detection caught up were vacated while down"""
+        if not rollup.restored or now - rollup.restored_at < self.checkpoint_interval:
+            return
+        for spot_num in rollup.restored:
+            if rollup.state.get_spot_status(spot_num)['status'] != 'occupied':
+                rollup.occupied_since.pop(spot_num, None)
+        rollup.restored.clear()
+
+    def start(self):
+        with self.start_lock:
+            if self.thread is not None:
+                return self
+            self.thread = threading.Thread(target=self._checkpoint_loop, name='rollup-checkpoint', daemon=True)
+            self.thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def _checkpoint_loop(self):
+        while not self.stopped.wait(self.checkpoint_interval):
+            self.checkpoint()
+
+    def stop(self):
+        self.stopped.set()
+        self.checkpoint()
+
+    def checkpoint(self):
+        """Write changed buckets, dwell histograms and parked cars to the history database"""
+        if self.event_log is None:
+            return
+        pending = []
+        with self.lock:
+            now = time.time()
+            for camera_id, rollup in self.cameras.items():
+                if not rollup.loaded:
+                    continue
+                self._forget_departed(rollup, now)
+                rows, dirty, expired = [], [], []
+                for name, series in rollup.series.items():
+                    for start, scope in series.dirty:
+                        entry = series.buckets.get(start, {}).get(scope)
+                        if entry is not None:
+                            rows.append((camera_id, name, start, json.dumps(scope), entry.occupied_seconds,
+                                         entry.arrivals, entry.departures))
+                    dirty.append((series, series.dirty))
+                    series.dirty = set()
+                    if series.newest is not None:
+                        expired.append((camera_id, name, series.oldest_kept()))
+                dwell = [(camera_id, json.dumps(scope), json.dumps(counts)) for scope, counts in rollup.dwell.items()]
+                parked = [(camera_id, json.dumps(spot_num), since)
+                          for spot_num, since in rollup.occupied_since.items()]
+                pending.append((camera_id, rows, dirty, expired, dwell, parked))
+        if not pending:
+            return
+
+        started = time.perf_counter()
+        try:
+            conn = self.event_log.connect()
+            try:
+                conn.executescript(SCHEMA)
+                with conn:
+                    for camera_id, rows, _, expired, dwell, parked in pending:
+                        conn.executemany("INSERT OR REPLACE INTO occupancy_rollups VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                        conn.executemany("DELETE FROM occupancy_rollups WHERE camera = ? AND granularity = ? "
+                                         "AND start < ?", expired)
+                        conn.executemany("INSERT OR REPLACE INTO occupancy_dwell VALUES (?, ?, ?)", dwell)
+                        conn.execute("DELETE FROM occupancy_open WHERE camera = ?", (camera_id,))
+                        conn.executemany("INSERT INTO occupancy_open VALUES (?, ?, ?)", parked)
+                        conn.execute("INSERT OR REPLACE INTO rollup_checkpoints VALUES (?, ?)", (camera_id, now))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error checkpointing occupancy rollups: {e}")
+            # Write the same buckets again next time
+            with self.lock:
+                for _, _, dirty, _, _, _ in pending:
+                    for series, keys in dirty:
+                        series.dirty |= keys
+            return
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage='rollup_checkpoint')
+
+    def history(self, camera_id, granularity='hour', spot=None, since=None, until=None):
+        """Occupancy buckets for the lot, or one spot, within [since, until)"""
+        now = time.time()
+        # Copy what the query needs under the lock; record() runs on the
+        # detection thread and must not wait for the arithmetic below
+        with self.lock:
+            rollup = self.cameras.get(camera_id)
+            if rollup is None or granularity not in rollup.series:
+                return None
+            series = rollup.series[granularity]
+            scope = LOT if spot is None else spot
+            capacity = series.width * (rollup.state.get_snapshot().total_spots if spot is None else 1)
+            if spot is None:
+                open_since = list(rollup.occupied_since.values())
+            else:
+                open_since = [rollup.occupied_since[spot]] if spot in rollup.occupied_since else []
+
+            # Every bucket in range, including quiet ones, but never more than are kept
+            last = series.start_of(min(until - 1e-6, now) if until is not None else now)
+            first = series.start_of(since) if since is not None else min(series.buckets, default=last)
+            first = max(first, last - (series.keep - 1) * series.width)
+
+            empty = Bucket()
+            entries = []
+            for start in range(first, last + 1, series.width):
+                entry = series.buckets.get(start, {}).get(scope, empty)
+                entries.append((start, entry.occupied_seconds, entry.arrivals, entry.departures))
+            dwell = list(rollup.dwell.get(scope, [0] * len(DWELL_BINS)))
+
+        # Cars still parked haven't been accrued yet. With arrivals sorted,
+        # cars parked before a bucket cover all of it and cars arriving
+        # inside it cover (end - arrival), summed from a prefix of arrivals
+        open_since.sort()
+        prefix = list(itertools.accumulate(open_since, initial=0.0))
+        buckets = []
+        for start, occupied, arrivals, departures in entries:
+            end = min(start + series.width, now)
+            before = bisect.bisect_right(open_since, start)
+            inside = max(bisect.bisect_left(open_since, end), before)
+            occupied += before * max(0.0, end - start)
+            occupied += (inside - before) * end - (prefix[inside] - prefix[before])
+            buckets.append({
+                'start': start,
+                'occupied_seconds': round(occupied, 1),
+                'utilisation': round(occupied / capacity, 4) if capacity else 0.0,
+                'arrivals': arrivals,
+                'departures': departures,
+            })
+        return {
+            'camera': camera_id,
+            'spot': spot,
+            'granularity': granularity,
+            'buckets': buckets,
+            'turnover': sum(bucket['arrivals'] for bucket in buckets),
+            'dwell_histogram': dict(zip(DWELL_LABELS, dwell)),
+        }
+
+occupancy_rollups = OccupancyRollups()
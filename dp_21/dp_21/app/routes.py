@@ -2,18 +2,31 @@ from flask import Blueprint, render_template, request, redirect, url_for, sessio
 from werkzeug.security import generate_password_hash, check_password_hash
 from app.models import db, User
 from app.parking_state import parking_state
-from run import get_latest_frame
-import time
+from app.spot_store import normalise_spot_id
+from app.frame_broadcaster import frame_broadcaster
+from app.history import occupancy_history
+from app.rollups import occupancy_rollups, GRANULARITIES
+from app.ingest import DeltaIngestor, IngestError, decode_payload, msgpack, MSGPACK_TYPES
+from metrics import registry
+import math
 
 main = Blueprint('main', __name__)
+ingestor = DeltaIngestor(parking_state)
+
+def snapshot_response(snapshot, body):
+    """Serve a pre-serialised snapshot body, or 304 if the client already has this version"""
+    version = str(snapshot.version)
+    if request.if_none_match.contains(version) or request.args.get('version') == version:
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.headers['ETag'] = snapshot.etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 def gen_frames():
-    while True:
-        frame = get_latest_frame()
-        if frame is not None:
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-        time.sleep(0.01)  # Small delay to prevent overwhelming the client
+    # Blocks until the detection loop publishes a newer frame
+    return frame_broadcaster.stream()
 
 @main.route('/video_feed')
 def video_feed():
@@ -21,6 +34,11 @@ def video_feed():
     return Response(gen_frames(),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@main.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint for per-stage timings and counters"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
 @main.route('/')
 def index():
     if 'username' not in session:
@@ -81,7 +99,8 @@ def get_parking_status():
     if 'username' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    return jsonify(parking_state.get_status())
+    snapshot = parking_state.get_snapshot()
+    return snapshot_response(snapshot, snapshot.body)
 
 @main.route('/dashboard')
 def dashboard():
@@ -93,8 +112,53 @@ def dashboard():
 
 @main.route('/api/parking/status')
 def parking_status_api():
-    spots = parking_state.get_all_spots()
-    return jsonify(spots)
+    snapshot = parking_state.get_snapshot()
+    return snapshot_response(snapshot, snapshot.spots_body())
+
+@main.route('/api/parking/history')
+def parking_history_api():
+    """Utilisation, turnover and dwell times per minute, hour or day bucket.
+
+    Query args: granularity (minute|hour|day), spot, camera, since, until.
+    """
+    granularity = request.args.get('granularity', 'hour')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f'granularity must be one of {", ".join(GRANULARITIES)}'}), 400
+    since = request.args.get('since', type=float)
+    until = request.args.get('until', type=float)
+    if any(value is not None and not math.isfinite(value) for value in (since, until)):
+        return jsonify({'error': 'since and until must be finite unix times'}), 400
+    history = occupancy_rollups.history(
+        request.args.get('camera', parking_state.camera_id),
+        granularity=granularity,
+        spot=request.args.get('spot', type=normalise_spot_id),
+        since=since,
+        until=until,
+    )
+    if history is None:
+        return jsonify({'error': 'Unknown camera'}), 404
+    return jsonify(history)
+
+@main.route('/api/parking/spots/<spot_num>/events')
+def spot_events_api(spot_num):
+    """Occupancy events of one spot; optional camera, since and until (unix seconds)"""
+    events = occupancy_history.spot_timeline(
+        normalise_spot_id(spot_num),
+        camera_id=request.args.get('camera', parking_state.camera_id),
+        since=request.args.get('since', type=float),
+        until=request.args.get('until', type=float),
+    )
+    return jsonify(events)
+
+@main.route('/api/plates/<plate>')
+def plate_history_api(plate):
+    """Where and when a plate has been seen, newest first"""
+    events = occupancy_history.plate_sightings(
+        plate,
+        since=request.args.get('since', type=float),
+        until=request.args.get('until', type=float),
+    )
+    return jsonify(events)
 
 @main.route('/parking')
 def parking_display():
@@ -108,8 +172,20 @@ def detected_numbers():
 
 @main.route('/update_parking_slots', methods=['POST'])
 def update_parking_slots():
+    """Legacy single-body update; remote detectors should use /api/parking/ingest"""
     data = request.json
-    parking_state.update_spots_from_detection(data)
+    parking_state.update_spots_from_detection(data, smooth=False)
     return jsonify({"status": "success", "message": "Parking slots updated."})
 
+@main.route('/api/parking/ingest', methods=['POST'])
+def parking_ingest():
+    """Batched per-spot deltas from remote detectors, as JSON or msgpack"""
+    if request.mimetype in MSGPACK_TYPES and msgpack is None:
+        return jsonify({'error': 'msgpack is not supported by this server'}), 415
+    try:
+        result = ingestor.ingest(decode_payload(request.get_data(), request.content_type))
+    except IngestError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
 # Add your existing routes here 
\ No newline at end of file
@@ -0,0 +1,185 @@
+import numpy as np
+
+EMPTY = 0
+OCCUPIED = 1
+STATUS_NAMES = ('empty', 'occupied')
+NO_PLATE = -1
+
+
+def normalise_spot_id(spot_id):
+    """Spot ids are ints where they look like numbers, else strings (e.g. 'A1')"""
+    if isinstance(spot_id, np.generic):
+        spot_id = spot_id.item()
+    if isinstance(spot_id, str) and spot_id.strip().isdigit():
+        return int(spot_id)
+    return spot_id
+
+
+class PlateTable:
+    """Interns plate strings so spots store a small integer id instead.
+
+    Ids are never reused or changed, so snapshots can share the table.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def intern(self, plate):
+        if not plate:
+            return NO_PLATE
+        plate_id = self.ids.get(plate)
+        if plate_id is None:
+            plate_id = self.ids[plate] = len(self.names)
+            self.names.append(plate)
+        return plate_id
+
+    def name(self, plate_id):
+        return self.names[plate_id] if plate_id >= 0 else None
+
+
+class SpotStore:
+    """Columnar per-spot state with vectorised, debounced updates.
+
+    Each spot is one row: a status byte, last confidence, interned plate
+    id, last change time and its debounce state (a ring of the last M
+    occupied votes, a moving average of those votes and when a pending
+    change started). A transition is confirmed only once N of the
+    last M frames agree, the average has crossed the hysteresis band and
+    the new state has held for its dwell time.
+
+    Updates take arrays of spot ids and only touch those rows; occupancy
+    counts are adjusted by the rows that actually changed. Spot ids may be
+    any hashable (e.g. 'A1'); integer layouts are looked up with a sorted
+    search, others through an id -> row index.
+    """
+
+    # Hysteresis band for the moving occupancy score
+    ENTER_OCCUPIED = 0.6
+    EXIT_OCCUPIED = 0.4
+
+    def __init__(self, spot_ids, window=5, votes=3, occupy_dwell=1.0, vacate_dwell=2.0, alpha=0.4):
+        ids = list(dict.fromkeys(normalise_spot_id(spot_id) for spot_id in spot_ids))
+        integer_ids = all(isinstance(spot_id, int) and not isinstance(spot_id, bool) for spot_id in ids)
+        if integer_ids:
+            ids.sort()
+        self.ids = tuple(ids)
+        self.index = {spot_id: row for row, spot_id in enumerate(self.ids)}
+        self.sorted_ids = np.asarray(self.ids, dtype=np.int64) if integer_ids and ids else None
+        count = len(self.ids)
+        self.window = window
+        self.required_votes = min(votes, window)
+        self.occupy_dwell = occupy_dwell
+        self.vacate_dwell = vacate_dwell
+        self.alpha = alpha
+
+        self.status = np.zeros(count, dtype=np.uint8)
+        self.confidence = np.zeros(count, dtype=np.float32)
+        self.plate_ids = np.full(count, NO_PLATE, dtype=np.int32)
+        self.changed_at = np.zeros(count, dtype=np.float64)
+        self.plates = PlateTable()
+        self.occupied = 0
+
+        # Debounce state
+        self.votes = np.zeros((count, window), dtype=bool)
+        self.vote_pos = np.zeros(count, dtype=np.int32)
+        self.vote_count = np.zeros(count, dtype=np.int32)
+        self.score = np.zeros(count, dtype=np.float32)
+        self.pending_since = np.full(count, np.nan)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def available(self):
+        return len(self.ids) - self.occupied
+
+    def rows(self, spot_ids):
+        """Map spot ids to row indices; returns (rows, mask of ids that exist)"""
+        if self.sorted_ids is not None:
+            try:
+                wanted = np.asarray(spot_ids, dtype=np.int64)
+            except (TypeError, ValueError, OverflowError):
+                wanted = None
+            if wanted is not None:
+                rows = np.minimum(np.searchsorted(self.sorted_ids, wanted), len(self.ids) - 1)
+                return rows, self.sorted_ids[rows] == wanted
+        rows = np.fromiter((self.index.get(normalise_spot_id(spot_id), -1) for spot_id in spot_ids),
+                           dtype=np.intp)
+        valid = rows >= 0
+        rows[~valid] = 0
+        return rows, valid
+
+    def row(self, spot_id):
+        return self.index.get(normalise_spot_id(spot_id))
+
+    def observe(self, rows, occupied, confidence, now):
+        """Feed one frame's observations; returns the rows whose status changed"""
+        occupied = np.asarray(occupied, dtype=bool)
+        confidence = np.clip(np.asarray(confidence, dtype=np.float32), 0.0, 1.0)
+        self.confidence[rows] = confidence
+
+        positions = self.vote_pos[rows]
+        self.votes[rows, positions] = occupied
+        self.vote_pos[rows] = (positions + 1) % self.window
+        counts = np.minimum(self.vote_count[rows] + 1, self.window)
+        self.vote_count[rows] = counts
+
+        # Average the votes, not the raw confidence: accepted boxes already
+        # passed the confidence filter, so a steady low-confidence car
+        # must still cross ENTER_OCCUPIED
+        sample = occupied.astype(np.float32)
+        score = self.score[rows] + self.alpha * (sample - self.score[rows])
+        self.score[rows] = score
+
+        currently = self.status[rows] == OCCUPIED
+        occupied_votes = self.votes[rows].sum(axis=1)
+        agreeing = np.where(currently, counts - occupied_votes, occupied_votes)
+        wants_change = np.where(currently, score <= self.EXIT_OCCUPIED, score >= self.ENTER_OCCUPIED)
+        wants_change &= agreeing >= self.required_votes
+
+        pending = self.pending_since[rows]
+        pending = np.where(wants_change, np.where(np.isnan(pending), now, pending), np.nan)
+        dwell = np.where(currently, self.vacate_dwell, self.occupy_dwell)
+        fire = wants_change & (now - pending >= dwell)
+        pending[fire] = np.nan
+        self.pending_since[rows] = pending
+
+        changed = rows[fire]
+        self._set_status(changed, np.where(currently[fire], EMPTY, OCCUPIED), now)
+        return changed
+
+    def force(self, rows, occupied, now, confidence=1.0):
+        """Accept observations as confirmed without debouncing; returns changed rows"""
+        occupied = np.asarray(occupied, dtype=bool)
+        self.confidence[rows] = confidence
+        self.score[rows] = occupied.astype(np.float32)
+        self.votes[rows] = False
+        self.vote_count[rows] = 0
+        self.vote_pos[rows] = 0
+        self.pending_since[rows] = np.nan
+        new_status = occupied.astype(np.uint8)
+        differs = self.status[rows] != new_status
+        changed = rows[differs]
+        self._set_status(changed, new_status[differs], now)
+        return changed
+
+    def _set_status(self, rows, new_status, now):
+        if not len(rows):
+            return
+        self.occupied += int(np.count_nonzero(new_status)) - int(np.count_nonzero(self.status[rows]))
+        self.status[rows] = new_status
+        self.changed_at[rows] = now
+        # Freed spots forget their plate
+        self.plate_ids[rows[new_status == EMPTY]] = NO_PLATE
+
+    def set_plate(self, row, plate):
+        """Store a plate on one row; returns True if it changed"""
+        plate_id = self.plates.intern(plate)
+        if self.plate_ids[row] == plate_id:
+            return False
+        self.plate_ids[row] = plate_id
+        return True
+
+    def spot(self, row):
+        return {'status': STATUS_NAMES[self.status[row]], 'plate': self.plates.name(self.plate_ids[row])}
@@ -19,43 +19,47 @@ function createParkingSlot(spot) {
     return slot;
 }
 
-function updateDashboard() {
-    fetch('/get_parking_status')
-        .then(response => response.json())
-        .then(data => {
-            // Update stats with animation
-            updateStatWithAnimation('total-spots', data.total_spots);
-            updateStatWithAnimation('available-spots', data.available);
-            updateStatWithAnimation('occupied-spots', data.occupied);
+// Version of the last snapshot or delta applied from the server
+let parkingVersion = -1;
 
-            // Update parking grid
-            const parkingGrid = document.getElementById('parking-grid');
-            data.spots.forEach(spot => {
-                const spotId = `spot-${spot.id}`;
-                let spotElement = document.getElementById(spotId);
-                
-                if (!spotElement) {
-                    spotElement = document.createElement('div');
-                    spotElement.id = spotId;
-                    parkingGrid.appendChild(spotElement);
-                }
+function updateStats(data) {
+    // Update stats with animation
+    updateStatWithAnimation('total-spots', data.total_spots);
+    updateStatWithAnimation('available-spots', data.available);
+    updateStatWithAnimation('occupied-spots', data.occupied);
+}
+
+function updateSpot(spot) {
+    const parkingGrid = document.getElementById('parking-grid');
+    const spotId = `spot-${spot.id}`;
+    let spotElement = document.getElementById(spotId);
 
-                // Update spot status with animation
-                if (spotElement.getAttribute('data-status') !== spot.status) {
-                    spotElement.className = `parking-spot ${spot.status}`;
-                    spotElement.setAttribute('data-status', spot.status);
-                    spotElement.innerHTML = `
-                        <h3>Spot ${spot.id}</h3>
-                        <p>${spot.status.toUpperCase()}</p>
-                        <p class="plate-info">${spot.plate ? 'Plate: ' + spot.plate : 'No plate detected'}</p>
-                        <i class="fas ${spot.status === 'occupied' ? 'fa-car' : 'fa-square-parking'}"></i>
-                    `;
-                    spotElement.classList.add('updated');
-                    setTimeout(() => spotElement.classList.remove('updated'), 300);
-                }
-            });
-        })
-        .catch(error => console.error('Error updating dashboard:', error));
+    if (!spotElement) {
+        spotElement = document.createElement('div');
+        spotElement.id = spotId;
+        parkingGrid.appendChild(spotElement);
+    }
+
+    // Update spot status with animation
+    if (spotElement.getAttribute('data-status') !== spot.status ||
+        spotElement.getAttribute('data-plate') !== (spot.plate || '')) {
+        spotElement.className = `parking-spot ${spot.status}`;
+        spotElement.setAttribute('data-status', spot.status);
+        spotElement.setAttribute('data-plate', spot.plate || '');
+        // Built with textContent so ids and plates are never parsed as HTML
+        const title = document.createElement('h3');
+        title.textContent = `Spot ${spot.id}`;
+        const status = document.createElement('p');
+        status.textContent = spot.status.toUpperCase();
+        const plate = document.createElement('p');
+        plate.className = 'plate-info';
+        plate.textContent = spot.plate ? 'Plate: ' + spot.plate : 'No plate detected';
+        const icon = document.createElement('i');
+        icon.className = `fas ${spot.status === 'occupied' ? 'fa-car' : 'fa-square-parking'}`;
+        spotElement.replaceChildren(title, status, plate, icon);
+        spotElement.classList.add('updated');
+        setTimeout(() => spotElement.classList.remove('updated'), 300);
+    }
 }
 
 function updateStatWithAnimation(elementId, newValue) {
@@ -71,11 +75,6 @@ function updateStatWithAnimation(elementId, newValue) {
     }
 }
 
-// Update every 200ms
-setInterval(updateDashboard, 200);
-
-// Initial update
-updateDashboard();
 
 // Add hover effects
 document.addEventListener('DOMContentLoaded', () => {
@@ -95,16 +94,24 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 });
 
-const socket = io.connect('http://localhost:5000');
+// The server pushes a full snapshot on connect, then versioned deltas
+const socket = io();
 
-socket.on('parking_status_update', function(data) {
-    const spotId = `spot-${data.spot_number}`;
-    const spotElement = document.getElementById(spotId);
-    if (spotElement) {
-        spotElement.className = `parking-spot ${data.status}`;
-        const plateInfo = spotElement.querySelector('.plate-info');
-        if (plateInfo) {
-            plateInfo.textContent = `Plate: ${data.plate || 'No plate detected'}`;
-        }
+socket.on('parking_snapshot', function(data) {
+    parkingVersion = data.version;
+    updateStats(data);
+    data.spots.forEach(updateSpot);
+});
+
+socket.on('parking_delta', function(data) {
+    if (data.version <= parkingVersion) {
+        return;  // Already covered by a newer snapshot
+    }
+    if (parkingVersion >= 0 && data.since > parkingVersion) {
+        // Missed a delta (e.g. during a reconnect), resync from a snapshot
+        socket.emit('request_snapshot');
     }
+    parkingVersion = data.version;
+    updateStats(data);
+    data.spots.forEach(updateSpot);
 });
\ No newline at end of file
@@ -1,18 +1,13 @@
 document.addEventListener('DOMContentLoaded', function() {
-    // Update parking data every 3 seconds
-    setInterval(updateParkingData, 3000);
+    // Spots are pushed by the server: a snapshot on connect, then deltas
+    const socket = io();
+    socket.on('parking_snapshot', updateParkingData);
+    socket.on('parking_delta', updateParkingData);
 });
 
-function updateParkingData() {
-    fetch('/api/parking/status')
-        .then(response => response.json())
-        .then(data => {
-            // Update each parking spot
-            for (let spotNum in data) {
-                updateSpotUI(spotNum, data[spotNum]);
-            }
-        })
-        .catch(error => console.error('Error fetching parking data:', error));
+function updateParkingData(data) {
+    // Update each parking spot
+    data.spots.forEach(spot => updateSpotUI(spot.id, spot));
 }
 
 function updateSpotUI(spotNum, spotData) {
@@ -20,7 +15,7 @@ function updateSpotUI(spotNum, spotData) {
     if (!spotElement) return;
     
     // Update status class
-    spotElement.className = `spot ${spotData.status}`;
+    spotElement.className = `parking-spot ${spotData.status}`;
     
     // Update plate info
     const plateElement = spotElement.querySelector('.plate-info');
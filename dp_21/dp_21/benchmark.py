@@ -0,0 +1,312 @@
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+import cv2
+import numpy as np
+
+try:
+    from config import DETECTION_FRAME_SIZE
+except ImportError:
+    DETECTION_FRAME_SIZE = (320, 240)
+
+# Benchmark the detection pipeline on recorded footage, no camera needed.
+#
+#   python benchmark.py --source clip.mp4 --output results.json
+#   python benchmark.py --source frames/ --compare results.json
+#
+# Frames are kept at their recorded resolution and scaled to the detection
+# size, like the live pipeline, so plate OCR crops from the original. Each
+# stage reports fps, p50/p95/p99 latency, CPU time and how much resident
+# memory it added, and the JSON output can be compared between commits with
+# --compare.
+
+STAGES = ['detect', 'plate', 'process_detections', 'process_frame_for_web', 'pipeline']
+
+# Not the primary camera, so process_detections leaves JPEG encoding and
+# publishing to the process_frame_for_web stage instead of timing it twice
+BENCHMARK_CAMERA = 'benchmark'
+
+
+# Training run output (plots, mosaics) that can sit next to footage but aren't frames
+NON_FRAME_PATTERNS = ('*_curve.png', 'confusion_matrix*', 'labels*.jpg', 'results.png',
+                      'train_batch*', 'val_batch*')
+
+
+def rss_mb():
+    """Current resident set size of this process in MB, if it can be measured"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, if it can be measured"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KB on Linux and bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def format_mb(value):
+    return 'n/a' if value is None else f"{value:+.1f} MB"
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except Exception:
+        return None
+
+
+def load_frames(source, limit):
+    """Read frames at their original size from a video file or a folder of images"""
+    frames = []
+    if os.path.isdir(source):
+        paths = []
+        for pattern in ('*.jpg', '*.jpeg', '*.png'):
+            paths.extend(glob.glob(os.path.join(source, pattern)))
+        skipped = {path for pattern in NON_FRAME_PATTERNS for path in glob.glob(os.path.join(source, pattern))}
+        if skipped:
+            print(f"Skipping {len(skipped)} training plots/mosaics in {source}")
+        paths = [path for path in paths if path not in skipped]
+        for path in sorted(paths)[:limit]:
+            frame = cv2.imread(path)
+            if frame is not None:
+                frames.append(frame)
+    else:
+        capture = cv2.VideoCapture(source)
+        while len(frames) < limit:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            frames.append(frame)
+        capture.release()
+    return frames
+
+
+class StageRecorder:
+    """Collect wall-clock and CPU time per call for one stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.cpu_times = []
+        self.rss_delta = None
+        self.peak_rss_delta = None
+        self.rss_before = None
+        self.peak_before = None
+
+    def begin(self):
+        """Mark the memory baseline before the stage's first call"""
+        self.rss_before = rss_mb()
+        self.peak_before = peak_rss_mb()
+
+    def end(self):
+        """Record how much resident memory (current and peak) the stage added"""
+        rss, peak = rss_mb(), peak_rss_mb()
+        if rss is not None and self.rss_before is not None:
+            self.rss_delta = rss - self.rss_before
+        if peak is not None and self.peak_before is not None:
+            self.peak_rss_delta = peak - self.peak_before
+
+    def measure(self, fn, *args):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        result = fn(*args)
+        self.cpu_times.append(time.process_time() - cpu_start)
+        self.latencies.append(time.perf_counter() - wall_start)
+        return result
+
+    def summary(self):
+        if not self.latencies:
+            return None
+        latencies = np.array(self.latencies) * 1000
+        total = float(np.sum(self.latencies))
+        return {
+            'calls': len(self.latencies),
+            'fps': len(self.latencies) / total if total else 0.0,
+            'mean_ms': float(latencies.mean()),
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'cpu_ms_per_call': float(np.mean(self.cpu_times) * 1000),
+            'cpu_utilisation': float(np.sum(self.cpu_times) / total) if total else 0.0,
+            'rss_delta_mb': self.rss_delta,
+            'peak_rss_delta_mb': self.peak_rss_delta,
+        }
+
+
+def run_benchmark(originals, size, warmup):
+    # Load the models through run so they are configured exactly like production
+    import run
+
+    detector = run.get_detector()
+    plate_detector = run.get_plate_detector()
+    recorders = {name: StageRecorder(name) for name in STAGES}
+    # The primary camera's spot layout, with a state of its own so the
+    # benchmark doesn't touch what the web app serves
+    spot_map = run.spot_maps[BENCHMARK_CAMERA] = run.get_spot_map(run.PRIMARY_CAMERA)
+    state = run.ParkingState(spot_map.spot_ids, BENCHMARK_CAMERA)
+    frames = [cv2.resize(original, size, interpolation=cv2.INTER_AREA) for original in originals]
+
+    for frame in frames[:warmup]:
+        detector.detect(frame)
+
+    # Stages in isolation
+    all_detections = []
+    recorders['detect'].begin()
+    for frame in frames:
+        all_detections.append(recorders['detect'].measure(detector.detect, frame))
+    recorders['detect'].end()
+
+    if plate_detector is not None:
+        recorders['plate'].begin()
+        for original, frame, detections in zip(originals, frames, all_detections):
+            # Crop from the original frame, as the live pipeline does
+            height, width = original.shape[:2]
+            scale = np.array([width / frame.shape[1], height / frame.shape[0]] * 2)
+            for box in detections[detections[:, 5].astype(int) == 1, :4] * scale:
+                x1, y1, x2, y2 = box.astype(int)
+                bbox = (max(x1, 0), max(y1, 0), min(x2, width), min(y2, height))
+                recorders['plate'].measure(plate_detector.detect_plate, original, bbox)
+        recorders['plate'].end()
+
+    # Spot assignment and drawing only; no OCR pool is attached yet
+    def post_process(frame, detections, original):
+        return run.process_detections(frame, detections, state, BENCHMARK_CAMERA, original)
+
+    recorders['process_detections'].begin()
+    for original, frame, detections in zip(originals, frames, all_detections):
+        recorders['process_detections'].measure(post_process, frame, detections, original)
+    recorders['process_detections'].end()
+
+    recorders['process_frame_for_web'].begin()
+    for frame in frames:
+        recorders['process_frame_for_web'].measure(run.process_frame_for_web, frame)
+    recorders['process_frame_for_web'].end()
+
+    # Whole pipeline: inference, spot handling, web encoding and the plate
+    # reads it queues, waiting for the OCR pool to finish them
+    if plate_detector is not None:
+        plate_detector.plate_cache.clear()
+    run.plate_trackers.clear()
+    ocr_pool = run.start_ocr_pool()
+
+    def pipeline(original, frame):
+        output = run.process_detections(frame, detector.detect(frame), state, BENCHMARK_CAMERA, original)
+        run.process_frame_for_web(output)
+        if ocr_pool is not None:
+            ocr_pool.wait_idle(timeout=60.0)
+        return output
+
+    recorders['pipeline'].begin()
+    try:
+        for original, frame in zip(originals, frames):
+            recorders['pipeline'].measure(pipeline, original, frame)
+    finally:
+        if ocr_pool is not None:
+            ocr_pool.stop()
+            run.ocr_pool = None
+    recorders['pipeline'].end()
+
+    return {name: recorder.summary() for name, recorder in recorders.items()}, detector.backend.name
+
+
+def compare(current, baseline, max_regression):
+    """Print p50/fps deltas per stage; returns False if any stage regressed"""
+    ok = True
+    for name in STAGES:
+        now, before = current['stages'].get(name), baseline['stages'].get(name)
+        if not now or not before:
+            continue
+        change = (now['p50_ms'] - before['p50_ms']) / before['p50_ms'] if before['p50_ms'] else 0.0
+        flag = ''
+        if change > max_regression:
+            flag = '  REGRESSION'
+            ok = False
+        print(f"{name:24s} p50 {before['p50_ms']:8.2f} -> {now['p50_ms']:8.2f} ms ({change:+.1%})"
+              f"  fps {before['fps']:7.1f} -> {now['fps']:7.1f}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parking detection pipeline")
+    parser.add_argument('--source', required=True, help="Video file or folder of recorded camera frames")
+    parser.add_argument('--frames', type=int, default=200, help="Maximum frames to replay")
+    parser.add_argument('--warmup', type=int, default=5, help="Untimed warm-up inferences")
+    parser.add_argument('--width', type=int, default=DETECTION_FRAME_SIZE[0], help="Detection width")
+    parser.add_argument('--height', type=int, default=DETECTION_FRAME_SIZE[1], help="Detection height")
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    parser.add_argument('--compare', help="Baseline JSON to compare against")
+    parser.add_argument('--max-regression', type=float, default=0.1,
+                        help="Allowed p50 slowdown per stage before --compare fails")
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames)
+    if not frames:
+        print(f"No frames could be read from {args.source}")
+        return 1
+    print(f"Replaying {len(frames)} frames from {args.source}")
+
+    stages, backend = run_benchmark(frames, (args.width, args.height), args.warmup)
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'source': args.source,
+        'frames': len(frames),
+        'frame_size': [args.width, args.height],
+        'backend': backend,
+        'stages': stages,
+    }
+    import run
+    plate_detector = run.get_plate_detector()
+    if plate_detector is not None:
+        results['ocr_tiers'] = plate_detector.tier_stats()
+
+    for name in STAGES:
+        stats = stages.get(name)
+        if stats:
+            print(f"{name:24s} {stats['fps']:7.1f} fps  p50 {stats['p50_ms']:7.2f}  "
+                  f"p95 {stats['p95_ms']:7.2f}  p99 {stats['p99_ms']:7.2f} ms  "
+                  f"cpu {stats['cpu_ms_per_call']:7.2f} ms/call  "
+                  f"rss {format_mb(stats['rss_delta_mb'])}")
+
+    for tier, stats in results.get('ocr_tiers', {}).items():
+        print(f"ocr tier {tier:15s} {stats['calls']:6d} calls  hit rate {stats['hit_rate']:6.1%}  "
+              f"mean {stats['mean_ms']:7.2f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,12 +2,73 @@
 def get_video_url():
     return "http://100.116.151.91:4747/video"  # Ensure this URL is accessible
 
+# Multi-camera Configuration
+def get_camera_urls():
+    # Camera id -> stream URL. All cameras share one batched detector;
+    # the first camera also feeds the web dashboard and video feed.
+    return {
+        'cam1': get_video_url(),
+    }
+
+# Spot layouts: <SPOT_MAP_DIR>/<camera id>.json with polygons per spot,
+# e.g. {"reference_size": [640, 480], "spots": {"1": [[x, y], ...]}}.
+# Cameras without a file use a 2x6 grid.
+SPOT_MAP_DIR = 'spot_maps'
+
+# Decode each camera in its own process and share frames through a
+# shared-memory ring instead of a thread inside the web process
+CAPTURE_IN_PROCESS = False
+CAPTURE_FRAME_SHAPE = (480, 640, 3)  # Ring slot (height, width, channels) if a camera's native size can't be probed
+CAPTURE_RESOLUTION = None  # (width, height) to request from cameras; None keeps their native resolution
+DETECTION_FRAME_SIZE = (320, 240)  # YOLO and spot maps work at this size; plate OCR uses the original frame
+CAPTURE_DECODER = 'default'  # 'default', 'ffmpeg' (low latency, HW decode) or 'gstreamer' (decode to working size)
+
 # Model Configuration
 MODEL_PATH = r"C:\vs_code\dp_21\dp_21\smart_parking\weights\best.pt"  # Path to your trained YOLO model
+INFERENCE_BACKEND = 'auto'  # 'torch', 'onnx', 'openvino' or 'auto' (best installed CPU runtime that passes the parity check)
+ONNX_INT8 = False  # Statically quantize the exported ONNX model to INT8
+CALIBRATION_IMAGE_DIR = None  # Folder of camera frames for INT8 calibration (required with ONNX_INT8) and the parity check ('auto' stays on PyTorch without it)
 
 # OCR Configuration
 OCR_LANGUAGES = ['en']  # Languages for license plate recognition
 MIN_OCR_CONFIDENCE = 0.6  # Minimum confidence for OCR detection
+OCR_TIERS = ['tesseract', 'easyocr']  # Tried in order; later tiers only see crops earlier ones couldn't read
+PLATE_CHAR_WHITELIST = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'  # Characters Tesseract may return for plates
+TESSERACT_MIN_CONFIDENCE = 0.75  # Tesseract word confidence needed to skip EasyOCR
+PLATE_MODEL_PATH = None  # Optional YOLO weights that detect plates; otherwise plates are found by shape
+PLATE_LOCATOR_FALLBACK = True  # OCR the whole vehicle crop when no plate region is found
+OCR_WORKERS = 2  # Plate OCR workers running beside the detection loop
+OCR_QUEUE_SIZE = 32  # Pending crops kept before the oldest is dropped
+OCR_USE_PROCESSES = False  # Use worker processes instead of threads
+PLATE_CACHE_SIZE = 256  # Plate reads kept per process
+PLATE_CACHE_TTL = 300.0  # Seconds before a cached plate is read again
+
+# Occupancy Smoothing Configuration
+OCCUPANCY_WINDOW = 5  # Frames considered per spot (M)
+OCCUPANCY_VOTES = 3  # Frames in the window that must agree (N)
+OCCUPY_DWELL_SECONDS = 1.0  # How long a car must persist before a spot is occupied
+VACATE_DWELL_SECONDS = 2.0  # How long a spot must look empty before it is freed
+OCCUPANCY_EMA_ALPHA = 0.4  # Weight of each frame in the occupancy vote moving average
+
+# Frame Scheduling Configuration
+SCHEDULER_CPU_BUDGET = 0.5  # Fraction of wall time the detection loop may spend busy
+SCHEDULER_MIN_FPS = 0.5  # Process a camera at least this often even without motion
+SCHEDULER_MAX_FPS = 15.0  # Upper bound on the inference rate
+MOTION_THRESHOLD = 0.01  # Fraction of changed low-res pixels that counts as motion
+ROI_MAX_FRACTION = 0.5  # Above this changed area, run YOLO on the full frame instead of regions
+INFERENCE_IMGSZ = None  # YOLO input size for full-frame passes; None keeps the model default (640)
+
+# Occupancy History Configuration
+HISTORY_DB_PATH = 'instance/occupancy.db'  # Append-only SQLite event log (WAL mode)
+HISTORY_BATCH_SIZE = 500  # Max events per INSERT transaction
+HISTORY_FLUSH_SECONDS = 1.0  # How long the writer waits for more events before committing
+HISTORY_QUEUE_SIZE = 10000  # Events buffered in memory before new ones are dropped
+
+# Occupancy Rollups (buckets kept in memory per granularity, checkpointed to HISTORY_DB_PATH)
+ROLLUP_MINUTES_KEPT = 1440  # One day of minute buckets
+ROLLUP_HOURS_KEPT = 720  # 30 days of hourly buckets
+ROLLUP_DAYS_KEPT = 365  # A year of daily buckets
+ROLLUP_CHECKPOINT_SECONDS = 60.0  # How often changed buckets are written to SQLite
 
 # Flask Configuration
 SECRET_KEY = 'your-secret-key-here'
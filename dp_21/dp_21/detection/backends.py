@@ -0,0 +1,348 @@
+import glob
+import json
+import os
+import cv2
+import numpy as np
+
+
+def results_to_array(results):
+    """Flatten ultralytics results into an (N, 6) float32 array of x1, y1, x2, y2, conf, cls"""
+    arrays = []
+    for result in results:
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            continue
+        arrays.append(np.column_stack((
+            boxes.xyxy.cpu().numpy(),
+            boxes.conf.cpu().numpy(),
+            boxes.cls.cpu().numpy(),
+        )))
+    if not arrays:
+        return np.zeros((0, 6), dtype=np.float32)
+    return np.concatenate(arrays).astype(np.float32, copy=False)
+
+
+def letterbox(frame, size, out):
+    """Resize frame into the (3, size, size) float buffer out, keeping aspect ratio.
+
+    Returns (scale, pad_x, pad_y) needed to map boxes back to the frame.
+    """
+    height, width = frame.shape[:2]
+    scale = min(size / width, size / height)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    out.fill(114 / 255.0)
+    # BGR HWC uint8 -> RGB CHW float in [0, 1]
+    out[:, pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized[:, :, ::-1].transpose(2, 0, 1) / 255.0
+    return scale, pad_x, pad_y
+
+
+def nms(detections, iou=0.45, max_det=300):
+    """Class-agnostic NMS over (N, 6) detections, matching ParkingDetector's agnostic setting"""
+    if len(detections) < 2:
+        return detections
+    xyxy = detections[:, :4]
+    rects = np.column_stack((xyxy[:, :2], xyxy[:, 2:] - xyxy[:, :2])).tolist()
+    indices = cv2.dnn.NMSBoxes(rects, detections[:, 4].tolist(), 0.0, iou)
+    indices = np.array(indices, dtype=np.int64).reshape(-1)[:max_det]
+    return detections[indices]
+
+
+def postprocess(output, scale, pad_x, pad_y, conf=0.25, iou=0.45, max_det=300):
+    """Decode one YOLOv8 head output (4 + classes, anchors) into (N, 6) detections"""
+    predictions = output.T
+    scores = predictions[:, 4:]
+    classes = scores.argmax(axis=1)
+    confidences = scores[np.arange(len(scores)), classes]
+    keep = confidences >= conf
+    if not keep.any():
+        return np.zeros((0, 6), dtype=np.float32)
+
+    boxes = predictions[keep, :4]
+    confidences = confidences[keep]
+    classes = classes[keep]
+    # Centre xywh in letterbox space -> corner xyxy in frame space
+    xyxy = np.empty_like(boxes)
+    xyxy[:, 0] = (boxes[:, 0] - boxes[:, 2] / 2 - pad_x) / scale
+    xyxy[:, 1] = (boxes[:, 1] - boxes[:, 3] / 2 - pad_y) / scale
+    xyxy[:, 2] = (boxes[:, 0] + boxes[:, 2] / 2 - pad_x) / scale
+    xyxy[:, 3] = (boxes[:, 1] + boxes[:, 3] / 2 - pad_y) / scale
+
+    detections = np.column_stack((xyxy, confidences, classes)).astype(np.float32)
+    return nms(detections, iou, max_det)
+
+
+class TorchBackend:
+    """Ultralytics PyTorch model, used as the reference implementation"""
+
+    name = 'torch'
+
+    def __init__(self, model_path, conf=0.25, iou=0.45, max_det=300):
+        import torch
+        from ultralytics import YOLO
+        self.torch = torch
+        self.model = YOLO(model_path)
+        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.model.to(self.device)
+        self.kwargs = {'conf': conf, 'iou': iou, 'agnostic_nms': True, 'max_det': max_det}
+
+    def predict(self, frames, imgsz=None):
+        kwargs = dict(self.kwargs, imgsz=imgsz) if imgsz else self.kwargs
+        with self.torch.no_grad():
+            results = self.model(list(frames), verbose=False, **kwargs)
+        return [results_to_array([result]) for result in results]
+
+
+class ExportedBackend:
+    """Shared pre/post-processing for ONNX Runtime and OpenVINO models.
+
+    Input buffers are allocated once per (batch, size) and reused, so the
+    steady state does no per-frame allocation for the model input.
+    """
+
+    def __init__(self, imgsz=640, conf=0.25, iou=0.45, max_det=300):
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.buffers = {}
+
+    def input_buffer(self, batch, size):
+        key = (batch, size)
+        if key not in self.buffers:
+            self.buffers[key] = np.empty((batch, 3, size, size), dtype=np.float32)
+        return self.buffers[key]
+
+    def predict(self, frames, imgsz=None):
+        size = imgsz or self.imgsz
+        buffer = self.input_buffer(len(frames), size)
+        transforms = [letterbox(frame, size, buffer[i]) for i, frame in enumerate(frames)]
+        outputs = self.run(buffer)
+        return [postprocess(outputs[i], *transforms[i], conf=self.conf, iou=self.iou, max_det=self.max_det)
+                for i in range(len(frames))]
+
+    def run(self, batch):
+        raise NotImplementedError
+
+
+class OnnxBackend(ExportedBackend):
+    name = 'onnx'
+
+    def __init__(self, onnx_path, threads=None, **kwargs):
+        import onnxruntime as ort
+        super().__init__(**kwargs)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.model_path = onnx_path
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoBackend(ExportedBackend):
+    name = 'openvino'
+
+    def __init__(self, onnx_path, **kwargs):
+        import openvino as ov
+        super().__init__(**kwargs)
+        core = ov.Core()
+        self.model_path = onnx_path
+        self.model = core.compile_model(core.read_model(onnx_path), 'CPU')
+        self.output = self.model.output(0)
+
+    def run(self, batch):
+        return self.model(batch)[self.output]
+
+
+def calibration_frames(image_dir, limit=100):
+    """Load up to limit images (e.g. the training set) for calibration or parity checks"""
+    if not image_dir:
+        return []
+    paths = []
+    for pattern in ('*.jpg', '*.jpeg', '*.png'):
+        paths.extend(glob.glob(os.path.join(image_dir, pattern)))
+    frames = [cv2.imread(path) for path in sorted(paths)[:limit]]
+    return [frame for frame in frames if frame is not None]
+
+
+def export_onnx(model_path, imgsz=640, int8=False, calibration_dir=None):
+    """Export the YOLO weights to ONNX next to the .pt file, once.
+
+    With int8=True the exported model is statically quantised using images
+    from calibration_dir. Returns the path of the model to load.
+    """
+    onnx_path = os.path.splitext(model_path)[0] + '.onnx'
+    if not os.path.exists(onnx_path):
+        from ultralytics import YOLO
+        print(f"Exporting {model_path} to ONNX...")
+        onnx_path = YOLO(model_path).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+
+    if not int8:
+        return onnx_path
+
+    int8_path = os.path.splitext(onnx_path)[0] + '.int8.onnx'
+    if os.path.exists(int8_path):
+        return int8_path
+
+    frames = calibration_frames(calibration_dir)
+    if not frames:
+        raise ValueError(f"INT8 quantisation needs calibration images, none found in "
+                         f"CALIBRATION_IMAGE_DIR={calibration_dir!r}")
+
+    from onnxruntime.quantization import CalibrationDataReader, QuantType, quantize_static
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self, input_name):
+            self.input_name = input_name
+            self.frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self.frames, None)
+            if frame is None:
+                return None
+            batch = np.empty((1, 3, imgsz, imgsz), dtype=np.float32)
+            letterbox(frame, imgsz, batch[0])
+            return {self.input_name: batch}
+
+    import onnxruntime as ort
+    input_name = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    print(f"Quantizing to INT8 with {len(frames)} calibration images...")
+    quantize_static(onnx_path, int8_path, FrameReader(input_name),
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+def box_iou(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes"""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:4], b[None, :, 2:4])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:4] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:4] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def check_parity(reference, candidate, frames, iou_threshold=0.5, min_match_rate=0.9):
+    """Compare a backend's detections against the PyTorch reference.
+
+    A reference box counts as matched when the candidate has a box of the
+    same class with IoU >= iou_threshold.
+    """
+    matched = total = extra = 0
+    max_conf_delta = 0.0
+    for frame in frames:
+        expected = reference.predict([frame])[0]
+        actual = candidate.predict([frame])[0]
+        total += len(expected)
+        extra += max(len(actual) - len(expected), 0)
+        if not len(expected) or not len(actual):
+            continue
+        ious = box_iou(expected, actual)
+        ious[expected[:, 5][:, None] != actual[:, 5][None, :]] = 0
+        best = ious.argmax(axis=1)
+        hits = ious[np.arange(len(expected)), best] >= iou_threshold
+        matched += int(hits.sum())
+        if hits.any():
+            deltas = np.abs(expected[hits, 4] - actual[best[hits], 4])
+            max_conf_delta = max(max_conf_delta, float(deltas.max()))
+
+    match_rate = matched / total if total else 1.0
+    return {
+        'frames': len(frames),
+        'reference_boxes': total,
+        'matched': matched,
+        'extra_boxes': extra,
+        'match_rate': match_rate,
+        'max_conf_delta': max_conf_delta,
+        'passed': match_rate >= min_match_rate,
+    }
+
+
+def parity_report(model_path, exported, calibration_dir, conf, iou, max_det):
+    """Parity of an exported backend against PyTorch, computed once and saved.
+
+    The report is stored as JSON next to the exported model and reused
+    while that model file is unchanged, so only the first start after an
+    export needs PyTorch. Returns None if there were no images to check.
+    """
+    path = f"{exported.model_path}.{exported.name}.parity.json"
+    modified = os.path.getmtime(exported.model_path)
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                report = json.load(f)
+            if report.get('model_mtime') == modified:
+                return report
+        except (OSError, ValueError):
+            pass
+
+    frames = calibration_frames(calibration_dir, limit=20)
+    if not frames:
+        return None
+    reference = TorchBackend(model_path, conf, iou, max_det)
+    report = check_parity(reference, exported, frames)
+    del reference
+    report['model_mtime'] = modified
+    try:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    except OSError as e:
+        print(f"Could not save parity report {path}: {e}")
+    return report
+
+
+def create_backend(model_path, backend='auto', conf=0.25, iou=0.45, max_det=300,
+                   imgsz=640, int8=False, calibration_dir=None, verify=True):
+    """Build the inference backend, exporting and parity-checking on first use.
+
+    backend is 'torch', 'onnx', 'openvino' or 'auto' (OpenVINO, then ONNX
+    Runtime, then PyTorch depending on what is installed). An exported model
+    that fails the parity check against PyTorch is not used; the check runs
+    once per exported model (see parity_report). Under 'auto' an exported
+    model is only used once it has passed that check; naming the backend
+    explicitly accepts it unverified when there are no images to check.
+    """
+    automatic = backend == 'auto'
+    if automatic:
+        backend = 'torch'
+        for name, module in (('openvino', 'openvino'), ('onnx', 'onnxruntime')):
+            try:
+                __import__(module)
+                backend = name
+                break
+            except ImportError:
+                continue
+
+    if backend == 'torch':
+        return TorchBackend(model_path, conf, iou, max_det)
+
+    try:
+        onnx_path = export_onnx(model_path, imgsz, int8, calibration_dir)
+        backend_class = OpenVinoBackend if backend == 'openvino' else OnnxBackend
+        exported = backend_class(onnx_path, imgsz=imgsz, conf=conf, iou=iou, max_det=max_det)
+    except Exception as e:
+        print(f"Error loading {backend} backend, falling back to PyTorch: {e}")
+        return TorchBackend(model_path, conf, iou, max_det)
+
+    if verify:
+        report = parity_report(model_path, exported, calibration_dir, conf, iou, max_det)
+        if report is None and automatic:
+            print(f"No images in CALIBRATION_IMAGE_DIR={calibration_dir!r} to verify {exported.name} "
+                  f"against PyTorch, using PyTorch backend")
+            return TorchBackend(model_path, conf, iou, max_det)
+        if report is None:
+            print(f"WARNING: no images in CALIBRATION_IMAGE_DIR={calibration_dir!r}; "
+                  f"{exported.name} detections are not verified against PyTorch")
+        else:
+            print(f"Parity check {exported.name} vs torch: {report}")
+            if not report['passed']:
+                print("Parity check failed, using PyTorch backend")
+                return TorchBackend(model_path, conf, iou, max_det)
+
+    print(f"Using {exported.name} inference backend ({onnx_path})")
+    return exported
@@ -0,0 +1,177 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+from metrics import child_metrics_queue, forward_metrics
+from detection.video_stream import VideoStream
+
+
+class SharedFrameRing:
+    """Ring of fixed-shape frame slots in shared memory.
+
+    One writer process fills slots in turn and stamps each with a sequence
+    number before and after copying the frame in. Readers in other
+    processes get a numpy view of the newest complete slot without any
+    pickling or copying; the view stays valid until the writer wraps
+    around to that slot again, which still_valid() can check.
+    """
+
+    def __init__(self, shape, slots=4, name=None, create=True):
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        # Header: latest sequence, then a begin/end stamp per slot
+        header_bytes = 8 * (1 + 2 * slots)
+        size = header_bytes + frame_bytes * slots
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        self.owner = create
+        self.header = np.ndarray((1 + 2 * slots,), dtype=np.int64, buffer=self.shm.buf)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8,
+                                 buffer=self.shm.buf, offset=header_bytes)
+        if create:
+            self.header[:] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def latest_sequence(self):
+        return int(self.header[0])
+
+    def write(self, frame):
+        """Copy a frame into the next slot and publish it (single writer only)"""
+        sequence = int(self.header[0]) + 1
+        slot = sequence % self.slots
+        self.header[1 + 2 * slot] = sequence       # begin stamp: slot is being written
+        self.frames[slot][...] = frame
+        self.header[2 + 2 * slot] = sequence       # end stamp: slot is complete
+        self.header[0] = sequence
+        return sequence
+
+    def still_valid(self, sequence):
+        """True while the slot holding sequence has not been overwritten"""
+        slot = sequence % self.slots
+        return self.header[1 + 2 * slot] == sequence and self.header[2 + 2 * slot] == sequence
+
+    def read_latest(self, after=0, copy=False):
+        """Return (sequence, frame) of the newest complete frame newer than after.
+
+        The frame is a view into the slot unless copy=True, in which case it
+        is a private copy checked not to have been overwritten mid-copy.
+        Returns (after, None) when there is nothing new.
+        """
+        for _ in range(self.slots):
+            sequence = int(self.header[0])
+            if sequence <= after:
+                return after, None
+            if not self.still_valid(sequence):
+                continue
+            frame = self.frames[sequence % self.slots]
+            if not copy:
+                return sequence, frame
+            frame = frame.copy()
+            if self.still_valid(sequence):
+                return sequence, frame
+        return after, None
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def probe_frame_shape(url, decoder='default', fallback=(480, 640, 3)):
+    """(height, width, channels) of a stream's frames at its native resolution"""
+    stream = VideoStream(url, decoder=decoder)._open()
+    try:
+        ret, frame = stream.read() if stream.isOpened() else (False, None)
+    finally:
+        stream.release()
+    if not ret or frame.ndim != 3:
+        print(f"Could not probe the frame size of {url}, using {tuple(fallback)}")
+        return tuple(fallback)
+    return frame.shape
+
+
+def capture_process(url, name, ring_name, shape, slots, decoder, stop_event, capture_size=None,
+                    metrics_queue=None):
+    """Decode a stream in its own process straight into a SharedFrameRing"""
+    forwarder = forward_metrics(metrics_queue, f'capture-{name}') if metrics_queue is not None else None
+    ring = SharedFrameRing(shape, slots, name=ring_name, create=False)
+    height, width = shape[:2]
+    # Frames only get resized if the camera changes resolution after the probe
+    stream = VideoStream(url, name, frame_size=(width, height), decoder=decoder,
+                         capture_size=capture_size)
+    try:
+        # VideoStream handles reconnects; we just copy each frame into the ring
+        for frame in stream.frames_forever():
+            if stop_event.is_set():
+                break
+            ring.write(frame)
+    finally:
+        stream.stop()
+        ring.close()
+        if forwarder is not None:
+            forwarder.stop()
+
+
+class RingVideoStream:
+    """VideoStream replacement whose capture runs in a separate process.
+
+    Frames arrive through a SharedFrameRing without pickling. read_latest()
+    returns a copy, because the detection loop keeps the frame (e.g. to crop
+    plates from) after the capture process may have reused its slot.
+
+    Ring slots have a fixed shape: the given shape, else capture_size, else
+    the camera's native size probed from its first frame (fallback_shape if
+    the probe fails).
+    """
+
+    def __init__(self, url, name='camera', shape=None, slots=4, decoder='default',
+                 capture_size=None, fallback_shape=(480, 640, 3)):
+        self.url = url
+        self.name = name
+        self.decoder = decoder
+        self.capture_size = capture_size
+        if shape is None and capture_size:
+            shape = (capture_size[1], capture_size[0], 3)
+        elif shape is None:
+            shape = probe_frame_shape(url, decoder, fallback_shape)
+        self.ring = SharedFrameRing(shape, slots)
+        self.stop_event = mp.Event()
+        self.process = None
+        self.last_sequence = 0
+
+    def start(self):
+        self.process = mp.Process(
+            target=capture_process,
+            args=(self.url, self.name, self.ring.name, self.ring.shape, self.ring.slots,
+                  self.decoder, self.stop_event, self.capture_size, child_metrics_queue()),
+            name=f"capture-{self.name}",
+            daemon=True,
+        )
+        self.process.start()
+        return self
+
+    def read_latest(self):
+        """Newest frame not yet returned, or None"""
+        sequence, frame = self.ring.read_latest(self.last_sequence, copy=True)
+        if frame is None:
+            return None
+        self.last_sequence = sequence
+        return frame
+
+    def health(self):
+        return {
+            'camera': self.name,
+            'connected': self.process is not None and self.process.is_alive(),
+            'frames': self.ring.latest_sequence(),
+        }
+
+    def stop(self):
+        self.stop_event.set()
+        if self.process is not None:
+            self.process.join(timeout=2.0)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.ring.close()
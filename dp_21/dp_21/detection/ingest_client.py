@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+import uuid
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class ParkingIngestClient:
+    """Send spot changes from an edge detector to /api/parking/ingest.
+
+    update() only records a spot when its state differs from what was last
+    queued, and a background thread posts everything pending as one batch
+    per flush interval over a pooled keep-alive session. A failed batch is
+    retried unchanged under the same sequence number, so the server applies
+    it at most once; newer changes wait for the next batch. The full state
+    is re-sent every resync_interval in case the server restarted.
+    """
+
+    def __init__(self, base_url='http://localhost:5000', source='edge', flush_interval=0.5,
+                 resync_interval=60.0, timeout=5.0, use_msgpack=True):
+        self.url = base_url.rstrip('/') + '/api/parking/ingest'
+        self.source = source
+        self.session_id = uuid.uuid4().hex
+        self.flush_interval = flush_interval
+        self.resync_interval = resync_interval
+        self.timeout = timeout
+        self.use_msgpack = use_msgpack and msgpack is not None
+
+        self.http = requests.Session()
+        self.http.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.http.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+        self.seq = 0
+        self.known = {}
+        self.pending = {}
+        self.inflight = None
+        self.last_resync = time.time()
+        self.lock = threading.Lock()
+        self.stopped = False
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._flush_loop, name='ingest-client', daemon=True)
+        self.thread.start()
+        return self
+
+    def update(self, spot_id, occupied, confidence=1.0, plate=None):
+        """Queue a spot's current state; unchanged states are not resent"""
+        state = (bool(occupied), plate)
+        with self.lock:
+            if self.known.get(spot_id) == state:
+                return
+            self.known[spot_id] = state
+            self.pending[spot_id] = [spot_id, state[0], round(float(confidence), 3), plate]
+
+    def _next_batch(self):
+        with self.lock:
+            if self.inflight is None:
+                if time.time() - self.last_resync >= self.resync_interval:
+                    self.last_resync = time.time()
+                    for spot_id, (occupied, plate) in self.known.items():
+                        self.pending.setdefault(spot_id, [spot_id, occupied, None, plate])
+                if not self.pending:
+                    return None
+                self.seq += 1
+                self.inflight = {
+                    'source': self.source,
+                    'session': self.session_id,
+                    'seq': self.seq,
+                    'updates': list(self.pending.values()),
+                }
+                self.pending = {}
+            return self.inflight
+
+    def _post(self, batch):
+        payload = {'batches': [batch]}
+        if self.use_msgpack:
+            body = msgpack.packb(payload, use_bin_type=True)
+            content_type = 'application/msgpack'
+        else:
+            body = json.dumps(payload)
+            content_type = 'application/json'
+        response = self.http.post(self.url, data=body, headers={'Content-Type': content_type},
+                                  timeout=self.timeout)
+        if response.status_code == 415 and self.use_msgpack:
+            # Server without msgpack support; fall back to JSON for good
+            self.use_msgpack = False
+            return self._post(batch)
+        response.raise_for_status()
+
+    def flush(self):
+        """Send the in-flight or pending batch now; returns True if one was delivered"""
+        batch = self._next_batch()
+        if batch is None:
+            return False
+        try:
+            self._post(batch)
+        except requests.RequestException as e:
+            print(f"Error sending parking updates (seq {batch['seq']}), will retry: {e}")
+            return False
+        with self.lock:
+            self.inflight = None
+        return True
+
+    def _flush_loop(self):
+        while not self.stopped:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def stop(self):
+        self.stopped = True
+        if self.thread is not None:
+            self.thread.join(self.flush_interval * 2)
+        self.flush()
+        self.http.close()
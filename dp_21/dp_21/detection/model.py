@@ -1,16 +1,20 @@
-from ultralytics import YOLO
-import torch
+from detection.backends import create_backend
 
 class ParkingDetector:
-    def __init__(self, model_path, conf=0.25, iou=0.45):
-        self.model = YOLO(model_path)
-        self.model.to('cuda' if torch.cuda.is_available() else 'cpu')
-        self.model.conf = conf
-        self.model.iou = iou
-        self.model.agnostic = True
-        self.model.max_det = 10
+    """YOLO parking detector on a pluggable inference backend.
+
+    detect() and detect_batch() return (N, 6) float32 arrays of
+    x1, y1, x2, y2, conf, cls in the input frame's pixel coordinates.
+    """
+
+    def __init__(self, model_path, conf=0.25, iou=0.45, backend='torch', **backend_options):
+        self.backend = create_backend(model_path, backend, conf=conf, iou=iou, **backend_options)
 
     def detect(self, frame):
-        with torch.no_grad():
-            results = self.model(frame, verbose=False)
-        return results 
\ No newline at end of file
+        return self.backend.predict([frame])[0]
+
+    def detect_batch(self, frames, imgsz=None):
+        """Run one batched inference call over frames from several cameras"""
+        if not frames:
+            return []
+        return self.backend.predict(list(frames), imgsz)
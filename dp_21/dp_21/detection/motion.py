@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+
+
+class MotionDetector:
+    """Cheap change detection on a low-resolution grayscale copy of the frame.
+
+    Frames are compared with the last frame that was actually processed, so
+    a car that arrives and stops keeps registering as a change until the
+    detector has looked at it.
+    """
+
+    def __init__(self, size=(80, 60), pixel_threshold=25, min_changed_fraction=0.01):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.reference = None
+
+    def thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def changed_mask(self, thumbnail):
+        """Boolean mask of pixels that differ from the reference"""
+        if self.reference is None:
+            return np.ones(thumbnail.shape, dtype=bool)
+        return cv2.absdiff(thumbnail, self.reference) > self.pixel_threshold
+
+    def score(self, thumbnail):
+        """Fraction of pixels that changed since the reference frame"""
+        return float(np.mean(self.changed_mask(thumbnail)))
+
+    def has_motion(self, thumbnail):
+        return self.score(thumbnail) >= self.min_changed_fraction
+
+    def changed_regions(self, thumbnail, frame_size, grid=(8, 6), min_tile_fraction=0.05, margin=16):
+        """Rectangles of the full frame that cover changed tiles.
+
+        The thumbnail is split into a cols x rows grid; tiles with enough
+        changed pixels are grouped into connected blobs and each blob's
+        bounding box is scaled to frame_size (width, height) and padded by
+        margin pixels.
+        """
+        mask = self.changed_mask(thumbnail)
+        cols, rows = grid
+        height, width = mask.shape
+        tile_h, tile_w = height // rows, width // cols
+        tiles = mask[:tile_h * rows, :tile_w * cols].reshape(rows, tile_h, cols, tile_w).mean(axis=(1, 3))
+        changed = (tiles >= min_tile_fraction).astype(np.uint8)
+
+        frame_w, frame_h = frame_size
+        scale_x, scale_y = frame_w / cols, frame_h / rows
+        count, _, stats, _ = cv2.connectedComponentsWithStats(changed, connectivity=8)
+        regions = []
+        for x, y, w, h, _ in stats[1:count]:
+            regions.append((
+                max(int(x * scale_x) - margin, 0),
+                max(int(y * scale_y) - margin, 0),
+                min(int((x + w) * scale_x) + margin, frame_w),
+                min(int((y + h) * scale_y) + margin, frame_h),
+            ))
+        return regions
+
+    def accept(self, thumbnail):
+        """Make thumbnail the new reference once its frame has been processed"""
+        self.reference = thumbnail
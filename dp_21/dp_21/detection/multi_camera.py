@@ -0,0 +1,111 @@
+import cv2
+import time
+
+from detection.scheduler import AdaptiveScheduler
+from detection.roi import RegionInference
+
+
+class MultiCameraEngine:
+    """Drive several VideoStreams through one shared ParkingDetector.
+
+    Each step pulls the newest frame from every camera, lets the scheduler
+    drop cameras whose scene has not changed, runs the rest through the
+    model as a single batch (only on the changed regions where possible)
+    and routes each camera's (N, 6) detection array back to the
+    ParkingState that belongs to it.
+
+    Inference runs on frames resized to frame_size while the camera's
+    original frame is kept alongside, so process_fn can crop plates at full
+    resolution; detections are in frame_size coordinates.
+    """
+
+    def __init__(self, detector, streams, states, process_fn, frame_size=(320, 240), scheduler=None,
+                 max_region_fraction=0.5, imgsz=None):
+        # streams and states are dicts keyed by camera id
+        self.detector = detector
+        self.streams = streams
+        self.states = states
+        self.process_fn = process_fn
+        self.frame_size = frame_size
+        self.scheduler = scheduler or AdaptiveScheduler()
+        self.inference = RegionInference(detector, max_region_fraction, imgsz=imgsz)
+        self.batches = 0
+
+    def start(self):
+        for camera_id, stream in self.streams.items():
+            print(f"Starting camera {camera_id}")
+            stream.start()
+        return self
+
+    def stop(self):
+        for stream in self.streams.values():
+            stream.stop()
+
+    def health(self):
+        """Per-camera capture health (fps, lag, reconnects)"""
+        return {camera_id: stream.health() for camera_id, stream in self.streams.items()}
+
+    def collect_frames(self):
+        """Grab the latest frame of every camera that has a new one.
+
+        Returns camera ids, inference-size frames and the original frames.
+        """
+        camera_ids = []
+        frames = []
+        originals = []
+        for camera_id, stream in self.streams.items():
+            original = stream.read_latest()
+            if original is None:
+                continue
+            frame = original
+            if self.frame_size is not None and (frame.shape[1], frame.shape[0]) != tuple(self.frame_size):
+                with self.scheduler.stage('resize'):
+                    frame = cv2.resize(original, self.frame_size, interpolation=cv2.INTER_AREA)
+            camera_ids.append(camera_id)
+            frames.append(frame)
+            originals.append(original)
+        return camera_ids, frames, originals
+
+    def step(self):
+        """Run one batched inference pass and return annotated frames by camera"""
+        started = time.perf_counter()
+        if not self.scheduler.ready(started):
+            return {}
+
+        camera_ids, frames, originals = self.collect_frames()
+        batch = []
+        for camera_id, frame, original in zip(camera_ids, frames, originals):
+            process, thumbnail, regions = self.scheduler.should_process(camera_id, frame, started)
+            if process:
+                batch.append((camera_id, frame, original, thumbnail, regions))
+        if not batch:
+            self.scheduler.skip_cycle()
+            return {}
+
+        with self.scheduler.stage('inference'):
+            detections = self.inference.detect([(camera_id, frame, regions)
+                                                for camera_id, frame, _, _, regions in batch])
+        self.batches += 1
+
+        outputs = {}
+        with self.scheduler.stage('postprocess'):
+            for camera_id, frame, original, thumbnail, regions in batch:
+                try:
+                    outputs[camera_id] = self.process_fn(frame, detections[camera_id],
+                                                         self.states[camera_id], camera_id, original)
+                    self.scheduler.mark_processed(camera_id, thumbnail, full=regions is None)
+                except Exception as e:
+                    print(f"Error processing camera {camera_id}: {e}")
+
+        self.scheduler.finish_cycle(started)
+        return outputs
+
+    def run(self, should_stop=None, idle_sleep=0.01):
+        """Step until should_stop() returns True, yielding each batch's output"""
+        while should_stop is None or not should_stop():
+            outputs = self.step()
+            if not outputs:
+                # Sleep until the scheduler allows the next pass
+                time.sleep(max(self.scheduler.time_until_ready(), idle_sleep))
+                continue
+            yield outputs
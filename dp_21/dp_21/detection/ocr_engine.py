@@ -0,0 +1,188 @@
+import threading
+import time
+import cv2
+
+from metrics import OCR_TIER_CALLS, STAGE_SECONDS
+from detection.plate_text import clean_plate_text, is_valid_plate
+
+try:
+    from config import OCR_TIERS, PLATE_CHAR_WHITELIST, TESSERACT_MIN_CONFIDENCE
+except ImportError:
+    OCR_TIERS = ['tesseract', 'easyocr']
+    PLATE_CHAR_WHITELIST = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+    TESSERACT_MIN_CONFIDENCE = 0.75
+
+
+def to_gray(image):
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+class TesseractTier:
+    """Cheap first pass: Tesseract in single-line mode restricted to plate characters"""
+
+    name = 'tesseract'
+
+    def __init__(self, whitelist=PLATE_CHAR_WHITELIST, min_confidence=TESSERACT_MIN_CONFIDENCE):
+        self.whitelist = whitelist
+        self.min_confidence = min_confidence
+        try:
+            import pytesseract
+            pytesseract.get_tesseract_version()
+            self.pytesseract = pytesseract
+        except Exception as e:
+            print(f"Tesseract unavailable, skipping that OCR tier: {e}")
+            self.pytesseract = None
+
+    @property
+    def available(self):
+        return self.pytesseract is not None
+
+    def read(self, gray):
+        """Return [(text, confidence)] for the words Tesseract found"""
+        # Tesseract wants dark text on a light background
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        if binary.mean() < 127:
+            binary = cv2.bitwise_not(binary)
+        config = f'--psm 7 -c tessedit_char_whitelist={self.whitelist}'
+        data = self.pytesseract.image_to_data(binary, config=config,
+                                              output_type=self.pytesseract.Output.DICT)
+        words = [(text, float(conf) / 100.0) for text, conf in zip(data['text'], data['conf'])
+                 if text.strip() and float(conf) >= 0]
+        if len(words) > 1:
+            # Plates are often split into groups; also offer the whole line
+            words.append((''.join(text for text, _ in words), min(conf for _, conf in words)))
+        return words
+
+    def read_text(self, gray, psm=6):
+        return self.pytesseract.image_to_string(gray, config=f'--psm {psm}')
+
+
+class EasyOCRTier:
+    """Accurate fallback: EasyOCR, loaded from the shared registry on first use"""
+
+    name = 'easyocr'
+
+    def __init__(self, languages=('en',), min_confidence=0.5):
+        self.languages = tuple(languages)
+        self.min_confidence = min_confidence
+        self.available = True
+
+    @property
+    def reader(self):
+        from detection.registry import models
+        return models.easyocr_reader(self.languages)
+
+    def read(self, gray):
+        thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                       cv2.THRESH_BINARY_INV, 11, 2)
+        return [(text, float(prob)) for _, text, prob in self.reader.readtext(thresh)]
+
+    def read_text(self, gray, psm=None):
+        return '\n'.join(text for _, text, _ in self.reader.readtext(gray))
+
+
+class TieredOCREngine:
+    """Plate recognition that escalates from cheap to expensive recognisers.
+
+    Tiers run in order and the first one whose best candidate passes
+    is_valid_plate at or above its tier's confidence threshold wins; only
+    crops the cheap tier can't read reach EasyOCR. read_plates() takes
+    several candidate crops of one vehicle and escalates just the most
+    promising of them. Each tier keeps call, accept and latency counters so
+    stats() shows where the time goes.
+    """
+
+    def __init__(self, tiers):
+        self.tiers = [tier for tier in tiers if tier.available]
+        self.lock = threading.Lock()
+        self.counters = {tier.name: {'calls': 0, 'accepted': 0, 'seconds': 0.0} for tier in self.tiers}
+
+    @classmethod
+    def from_config(cls, languages=('en',), min_confidence=0.5, tiers=OCR_TIERS):
+        built = []
+        for name in tiers:
+            if name == 'tesseract':
+                built.append(TesseractTier())
+            elif name == 'easyocr':
+                built.append(EasyOCRTier(languages, min_confidence))
+            else:
+                print(f"Unknown OCR tier {name!r}, ignoring it")
+        return cls(built)
+
+    def _record(self, tier, elapsed, accepted):
+        with self.lock:
+            counters = self.counters[tier.name]
+            counters['calls'] += 1
+            counters['seconds'] += elapsed
+            counters['accepted'] += int(accepted)
+        OCR_TIER_CALLS.inc(tier=tier.name, result='accepted' if accepted else 'escalated')
+        STAGE_SECONDS.observe(elapsed, stage=f'ocr_{tier.name}')
+
+    def _read_tier(self, tier, gray):
+        """Run one tier: return (plate, confidence) or (None, 0.0), and its highest raw score"""
+        started = time.perf_counter()
+        try:
+            candidates = tier.read(gray)
+        except Exception as e:
+            print(f"Error in {tier.name} OCR: {e}")
+            candidates = []
+        best = (None, 0.0)
+        for text, confidence in candidates:
+            text = clean_plate_text(text)
+            if confidence >= tier.min_confidence and is_valid_plate(text) and confidence > best[1]:
+                best = (text, confidence)
+        self._record(tier, time.perf_counter() - started, best[0] is not None)
+        return best, max((confidence for _, confidence in candidates), default=0.0)
+
+    def read_plate(self, image):
+        """Return (plate, confidence, tier name); (None, 0.0, None) if no tier could read it"""
+        return self.read_plates([image])
+
+    def read_plates(self, images):
+        """Best plate across ranked candidate crops of the same vehicle.
+
+        Each tier reads every candidate still in play. If none gives a valid
+        plate, only the candidate that tier scored highest (the first on a
+        tie) moves on to the next, more expensive tier.
+        """
+        grays = [to_gray(image) for image in images]
+        for tier in self.tiers:
+            if not grays:
+                break
+            best, scores = (None, 0.0), []
+            for gray in grays:
+                plate, score = self._read_tier(tier, gray)
+                scores.append(score)
+                if plate[0] is not None and plate[1] > best[1]:
+                    best = plate
+            if best[0] is not None:
+                return best[0], best[1], tier.name
+            grays = [grays[scores.index(max(scores))]]
+        return None, 0.0, None
+
+    def read_text(self, image, psm=6):
+        """Free-form text from the cheapest tier that returns any"""
+        gray = to_gray(image)
+        for tier in self.tiers:
+            try:
+                text = tier.read_text(gray, psm)
+            except Exception as e:
+                print(f"Error in {tier.name} OCR: {e}")
+                continue
+            if text.strip():
+                return text
+        return ''
+
+    def stats(self):
+        """Per-tier calls, hit rate (share of calls that produced a plate) and mean latency"""
+        with self.lock:
+            return {
+                name: {
+                    'calls': c['calls'],
+                    'accepted': c['accepted'],
+                    'hit_rate': c['accepted'] / c['calls'] if c['calls'] else 0.0,
+                    'mean_ms': c['seconds'] / c['calls'] * 1000 if c['calls'] else 0.0,
+                    'seconds': c['seconds'],
+                }
+                for name, c in self.counters.items()
+            }
@@ -0,0 +1,144 @@
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import OCR_JOBS_DROPPED, child_metrics_queue, forward_metrics
+
+# Plate detector owned by each OCR worker process
+_process_detector = None
+
+
+def _init_process_worker(languages, min_confidence, metrics_queue=None):
+    global _process_detector
+    if metrics_queue is not None:
+        forward_metrics(metrics_queue, 'ocr-worker')
+    from detection.plate_detector import PlateDetector
+    _process_detector = PlateDetector(languages, min_confidence)
+
+
+def _read_plate_in_process(crop, spot_id):
+    height, width = crop.shape[:2]
+    return _process_detector.detect_plate(crop, (0, 0, width, height), spot_id)
+
+
+class OCRWorkerPool:
+    """Plate OCR stage that runs outside the detection loop.
+
+    The detection thread submits spot crops to a bounded queue and returns
+    immediately. Worker threads (or processes) run PlateDetector on them and
+    hand each result to on_result. When the queue is full the oldest crop
+    is dropped so occupancy updates never wait on OCR, and on_drop is told
+    about it so the crop can be submitted again later.
+    """
+
+    def __init__(self, on_result, detector=None, workers=2, queue_size=32,
+                 use_processes=False, languages=['en'], min_confidence=0.5, on_drop=None):
+        self.on_result = on_result
+        self.on_drop = on_drop
+        self.detector = detector
+        self.workers = max(1, workers)
+        self.jobs = deque(maxlen=max(1, queue_size))
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.threads = []
+        self.executor = None
+        if use_processes:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_process_worker,
+                initargs=(languages, min_confidence, child_metrics_queue()),
+            )
+        elif detector is None:
+            raise ValueError("A PlateDetector is required for thread workers")
+
+        # Counters for monitoring how far OCR is falling behind
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"ocr-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def submit(self, job_key, crop, context=None):
+        """Queue a crop for OCR without blocking; returns False if stopped"""
+        dropped = None
+        with self.condition:
+            if self.stopped:
+                return False
+            if len(self.jobs) == self.jobs.maxlen:
+                dropped = self.jobs[0]  # deque drops the oldest job on append
+                self.dropped += 1
+                OCR_JOBS_DROPPED.inc()
+            self.jobs.append((job_key, crop, context))
+            self.submitted += 1
+            self.condition.notify()
+
+        if dropped is not None and self.on_drop is not None:
+            try:
+                self.on_drop(dropped[0], dropped[2])
+            except Exception as e:
+                print(f"Error handling dropped OCR job: {e}")
+        return True
+
+    def pending(self):
+        with self.condition:
+            return len(self.jobs)
+
+    def wait_idle(self, timeout=None):
+        """Block until every queued crop has been read; False on timeout"""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.jobs and not self.in_flight, timeout)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.jobs.clear()
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _read_plate(self, job_key, crop):
+        # job_key doubles as the plate cache's spot id
+        if self.executor is not None:
+            return self.executor.submit(_read_plate_in_process, crop, job_key).result()
+        height, width = crop.shape[:2]
+        return self.detector.detect_plate(crop, (0, 0, width, height), job_key)
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                while not self.jobs and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                job_key, crop, context = self.jobs.popleft()
+                self.in_flight += 1
+
+            try:
+                self._run_job(job_key, crop, context)
+            finally:
+                with self.condition:
+                    self.in_flight -= 1
+                    self.condition.notify_all()
+
+    def _run_job(self, job_key, crop, context):
+        try:
+            plate, confidence = self._read_plate(job_key, crop)
+        except Exception as e:
+            print(f"Error in OCR worker: {e}")
+            self.failed += 1
+            return
+
+        self.completed += 1
+        try:
+            self.on_result(job_key, plate, confidence, context)
+        except Exception as e:
+            print(f"Error merging OCR result: {e}")
@@ -1,20 +1,123 @@
-import easyocr
 import cv2
 import numpy as np
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import OCR_CALLS, PLATE_CACHE_LOOKUPS, STAGE_SECONDS
+from detection.registry import models
+from detection.ocr_engine import clean_plate_text, is_valid_plate
+from detection.plate_locator import PlateLocator
+
+try:
+    from config import PLATE_MODEL_PATH, PLATE_LOCATOR_FALLBACK
+except ImportError:
+    PLATE_MODEL_PATH = None
+    PLATE_LOCATOR_FALLBACK = True
+
+class PlateCache:
+    """Bounded LRU cache of plate reads with a time-to-live.
+
+    Keys are (spot id, perceptual hash of the crop), so a parked car that
+    has not moved maps to the same entry and skips EasyOCR entirely.
+    """
+
+    def __init__(self, max_size=256, ttl=300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def perceptual_hash(gray):
+        """64-bit difference hash of a grayscale image"""
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        return int(np.packbits(bits).view('>u8')[0])
+
+    def get(self, key):
+        """Return the cached (plate, confidence) or None on a miss"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at = entry
+            if time.time() - stored_at > self.ttl:
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
 
 class PlateDetector:
-    def __init__(self, languages=['en'], min_confidence=0.5):
-        print("Initializing EasyOCR with languages:", languages)
+    """Read the plate of a vehicle: cache lookup, plate localisation, then tiered OCR"""
+
+    def __init__(self, languages=['en'], min_confidence=0.5, cache_size=256, cache_ttl=300.0,
+                 locator=None, fallback_to_crop=PLATE_LOCATOR_FALLBACK):
+        print("Initializing OCR engine with languages:", languages)
         try:
-            self.reader = easyocr.Reader(languages)
-            print("EasyOCR initialized successfully")
+            # Shared with every other user of the same languages in this process
+            self.engine = models.ocr_engine(languages, min_confidence)
+            print("OCR tiers:", ', '.join(tier.name for tier in self.engine.tiers))
         except Exception as e:
-            print(f"Error initializing EasyOCR: {e}")
+            print(f"Error initializing OCR engine: {e}")
             raise
         self.min_confidence = min_confidence
-        self.plate_cache = {}  # Cache to improve stability
+        if locator is None:
+            plate_model = models.parking_detector(PLATE_MODEL_PATH) if PLATE_MODEL_PATH else None
+            locator = PlateLocator(plate_model)
+        self.locator = locator
+        # Whether to OCR the whole vehicle crop when no plate region is found
+        self.fallback_to_crop = fallback_to_crop
+        self.plate_cache = PlateCache(cache_size, cache_ttl)
+        self.ocr_calls = 0
+        self.ocr_seconds = 0.0
+
+    def tier_stats(self):
+        """Per-tier OCR hit rate and latency"""
+        return self.engine.stats()
 
-    def detect_plate(self, image, bbox):
+    def cache_stats(self):
+        """Cache counters plus an estimate of the OCR time saved by hits"""
+        stats = self.plate_cache.stats()
+        average = self.ocr_seconds / self.ocr_calls if self.ocr_calls else 0.0
+        stats['ocr_calls'] = self.ocr_calls
+        stats['ocr_seconds'] = self.ocr_seconds
+        stats['estimated_seconds_saved'] = stats['hits'] * average
+        return stats
+
+    def detect_plate(self, image, bbox, spot_id=None):
         try:
             # Extract the region containing the vehicle
             x1, y1, x2, y2 = map(int, bbox)
@@ -31,54 +134,46 @@ class PlateDetector:
                 print("Invalid vehicle region, skipping plate detection")
                 return None, 0.0
             
-            # Resize for better OCR
+            # Small grayscale copy for the cache key and the whole-crop fallback
             height = min(200, vehicle_region.shape[0])
             width = int(height * (vehicle_region.shape[1] / vehicle_region.shape[0]))
-            vehicle_region = cv2.resize(vehicle_region, (width, height))
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(vehicle_region, cv2.COLOR_BGR2GRAY)
-            
-            # Apply adaptive thresholding
-            thresh = cv2.adaptiveThreshold(
-                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                cv2.THRESH_BINARY_INV, 11, 2
-            )
-            
-            # Detect text in the region
-            results = self.reader.readtext(thresh)
-            
-            # Process results
-            valid_plates = []
-            for (box, text, prob) in results:
-                if prob > self.min_confidence:
-                    text = self.clean_plate_text(text)
-                    if self.is_valid_plate(text):
-                        valid_plates.append((text, prob))
-            
-            # Return highest confidence plate
-            if valid_plates:
-                valid_plates.sort(key=lambda x: x[1], reverse=True)
-                return valid_plates[0]
+            gray = cv2.cvtColor(cv2.resize(vehicle_region, (width, height)), cv2.COLOR_BGR2GRAY)
+
+            # Reuse the last read while the spot shows the same vehicle
+            cache_key = None
+            if spot_id is not None:
+                cache_key = (spot_id, PlateCache.perceptual_hash(gray))
+                cached = self.plate_cache.get(cache_key)
+                PLATE_CACHE_LOOKUPS.inc(result='miss' if cached is None else 'hit')
+                if cached is not None:
+                    return cached
             
-            return None, 0.0
+            # OCR only the plate-shaped regions, found at the crop's full resolution
+            regions = [plate for plate, _ in self.locator.locate(vehicle_region)]
+            if not regions and self.fallback_to_crop:
+                regions = [gray]
+
+            # Tesseract over every candidate; only the best one escalates to EasyOCR
+            best = (None, 0.0)
+            if regions:
+                started = time.perf_counter()
+                plate, confidence, tier = self.engine.read_plates(regions)
+                elapsed = time.perf_counter() - started
+                self.ocr_calls += 1
+                self.ocr_seconds += elapsed
+                OCR_CALLS.inc()
+                STAGE_SECONDS.observe(elapsed, stage='ocr')
+                if plate:
+                    best = (plate, confidence)
+
+            # Only successful reads are cached; failures are left to the tracker's retry
+            if cache_key is not None and best[0] is not None:
+                self.plate_cache.put(cache_key, best)
+            return best
             
         except Exception as e:
             print(f"Error in plate detection: {e}")
             return None, 0.0
     
-    @staticmethod
-    def clean_plate_text(text):
-        # Remove unwanted characters and normalize
-        text = text.upper().strip()
-        text = ''.join(c for c in text if c.isalnum())
-        return text
-    
-    @staticmethod
-    def is_valid_plate(text):
-        # Basic validation for license plate format
-        if len(text) >= 4 and len(text) <= 10:
-            has_letters = any(c.isalpha() for c in text)
-            has_numbers = any(c.isdigit() for c in text)
-            return has_letters and has_numbers
-        return False 
\ No newline at end of file
+    clean_plate_text = staticmethod(clean_plate_text)
+    is_valid_plate = staticmethod(is_valid_plate) 
\ No newline at end of file
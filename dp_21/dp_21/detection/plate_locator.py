@@ -0,0 +1,142 @@
+import cv2
+import numpy as np
+
+from metrics import PLATE_LOCATIONS, STAGE_SECONDS
+
+
+def order_corners(points):
+    """Sort four points as top-left, top-right, bottom-right, bottom-left"""
+    points = np.asarray(points, dtype=np.float32)
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).reshape(-1)
+    return np.array([points[np.argmin(sums)], points[np.argmin(diffs)],
+                     points[np.argmax(sums)], points[np.argmax(diffs)]], dtype=np.float32)
+
+
+class PlateLocator:
+    """Find licence plate rectangles in a vehicle crop and rectify them.
+
+    By default this uses morphology: plates are rows of high-contrast
+    characters, so a black-hat/top-hat transform followed by a horizontal
+    gradient and a closing turns each plate into a solid blob. Blobs with a
+    plate-like aspect ratio and size are warped to an upright strip of fixed
+    height. If a plate detector (anything with detect(image) returning
+    (N, 6) boxes, e.g. a ParkingDetector on plate weights) is given, its
+    boxes are used instead.
+    """
+
+    def __init__(self, detector=None, min_aspect=2.0, max_aspect=6.5, min_area=0.002, max_area=0.2,
+                 output_height=48, max_candidates=3):
+        self.detector = detector
+        self.min_aspect = min_aspect
+        self.max_aspect = max_aspect
+        self.min_area = min_area          # Fractions of the crop area
+        self.max_area = max_area
+        self.output_height = output_height
+        self.max_candidates = max_candidates
+
+    def locate(self, image):
+        """Return up to max_candidates (plate_image, (x1, y1, x2, y2)), most plate-like first"""
+        with STAGE_SECONDS.time(stage='plate_locate'):
+            if self.detector is not None:
+                candidates = self._from_detector(image)
+            else:
+                candidates = self._from_morphology(image)
+        PLATE_LOCATIONS.inc(result='found' if candidates else 'none')
+        return candidates
+
+    def _from_detector(self, image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        color = image if image.ndim == 3 else cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        detections = self.detector.detect(color)
+        detections = detections[np.argsort(-detections[:, 4])][:self.max_candidates]
+        height, width = gray.shape
+        candidates = []
+        for x1, y1, x2, y2 in detections[:, :4].astype(int):
+            x1, y1, x2, y2 = max(x1, 0), max(y1, 0), min(x2, width), min(y2, height)
+            if x2 - x1 < 8 or y2 - y1 < 4:
+                continue
+            plate = gray[y1:y2, x1:x2]
+            scale = self.output_height / plate.shape[0]
+            plate = cv2.resize(plate, (max(1, int(plate.shape[1] * scale)), self.output_height),
+                               interpolation=cv2.INTER_CUBIC)
+            candidates.append((plate, (x1, y1, x2, y2)))
+        return candidates
+
+    def _from_morphology(self, image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        height, width = gray.shape
+        if height < 16 or width < 32:
+            return []
+
+        # Kernel sized to a character group at this crop size
+        kernel_w = max(9, width // 20)
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_w, max(3, kernel_w // 3)))
+        # Dark characters on a light plate, or light on dark
+        text = cv2.max(cv2.morphologyEx(gray, cv2.MORPH_BLACKHAT, kernel),
+                       cv2.morphologyEx(gray, cv2.MORPH_TOPHAT, kernel))
+
+        gradient = np.abs(cv2.Sobel(text, cv2.CV_32F, 1, 0, ksize=3))
+        gradient = cv2.normalize(gradient, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+        gradient = cv2.GaussianBlur(gradient, (5, 5), 0)
+        closed = cv2.morphologyEx(gradient, cv2.MORPH_CLOSE, kernel)
+        _, mask = cv2.threshold(closed, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        mask = cv2.erode(mask, None, iterations=1)
+        mask = cv2.dilate(mask, None, iterations=2)
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        scored = []
+        crop_area = float(width * height)
+        for contour in contours:
+            (cx, cy), (rect_w, rect_h), angle = cv2.minAreaRect(contour)
+            long_side, short_side = max(rect_w, rect_h), min(rect_w, rect_h)
+            if short_side < 8:
+                continue
+            aspect = long_side / short_side
+            area = long_side * short_side / crop_area
+            if not (self.min_aspect <= aspect <= self.max_aspect and self.min_area <= area <= self.max_area):
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            # Rank by how much character edge energy the blob holds
+            score = float(gradient[y:y + h, x:x + w].mean())
+            scored.append((score, ((cx, cy), (rect_w, rect_h), angle), aspect, (x, y, x + w, y + h)))
+
+        # Rectify the strongest blobs, then prefer those that look like a row of characters
+        scored.sort(key=lambda item: item[0], reverse=True)
+        candidates = []
+        for score, rect, aspect, bounds in scored[:self.max_candidates * 2]:
+            plate = self._rectify(gray, rect, aspect)
+            characters = self.count_characters(plate)
+            candidates.append(((4 <= characters <= 10, min(characters, 10) * score), plate, bounds))
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        return [(plate, bounds) for _, plate, bounds in candidates[:self.max_candidates]]
+
+    @staticmethod
+    def count_characters(plate):
+        """Connected components in a rectified strip with the size of a plate character"""
+        # Drop the padding added by _rectify so the surroundings don't join up with characters
+        height, width = plate.shape[:2]
+        plate = plate[height // 10:height - height // 10, width // 20:width - width // 20]
+        _, binary = cv2.threshold(plate, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        if binary.mean() > 127:
+            # Make the characters the foreground
+            binary = cv2.bitwise_not(binary)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary)
+        height = plate.shape[0]
+        heights, widths = stats[1:, cv2.CC_STAT_HEIGHT], stats[1:, cv2.CC_STAT_WIDTH]
+        return int(np.count_nonzero((heights >= 0.3 * height) & (heights <= 0.95 * height) & (widths < height)))
+
+    def _rectify(self, gray, rect, aspect):
+        """Warp a rotated plate rectangle (padded slightly) to an upright strip"""
+        (cx, cy), (rect_w, rect_h), angle = rect
+        rect = ((cx, cy), (rect_w * 1.1 + 4, rect_h * 1.2 + 4), angle)
+        corners = order_corners(cv2.boxPoints(rect))
+        if np.linalg.norm(corners[1] - corners[0]) < np.linalg.norm(corners[3] - corners[0]):
+            # minAreaRect reported the plate standing up; rotate the corner order
+            corners = np.roll(corners, -1, axis=0)
+        out_h = self.output_height
+        out_w = int(min(out_h * aspect * 1.1, out_h * 8))
+        target = np.array([[0, 0], [out_w - 1, 0], [out_w - 1, out_h - 1], [0, out_h - 1]], dtype=np.float32)
+        matrix = cv2.getPerspectiveTransform(corners, target)
+        return cv2.warpPerspective(gray, matrix, (out_w, out_h), flags=cv2.INTER_CUBIC,
+                                   borderMode=cv2.BORDER_REPLICATE)
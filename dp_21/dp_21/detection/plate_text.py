@@ -0,0 +1,13 @@
+def clean_plate_text(text):
+    # Remove unwanted characters and normalize
+    text = text.upper().strip()
+    return ''.join(c for c in text if c.isalnum())
+
+
+def is_valid_plate(text):
+    # Basic validation for license plate format
+    if 4 <= len(text) <= 10:
+        has_letters = any(c.isalpha() for c in text)
+        has_numbers = any(c.isdigit() for c in text)
+        return has_letters and has_numbers
+    return False
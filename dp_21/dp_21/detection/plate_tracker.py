@@ -0,0 +1,101 @@
+import time
+import threading
+import cv2
+import numpy as np
+
+
+class SpotPlateTracker:
+    """Decide when an occupied spot needs a fresh plate read.
+
+    OCR is only requested when a spot goes from empty to occupied or when
+    the vehicle crop changes noticeably; otherwise the last plate read for
+    that spot is reused.
+    """
+
+    def __init__(self, change_threshold=12.0, retry_interval=5.0, thumb_size=(32, 16)):
+        self.change_threshold = change_threshold  # Mean abs pixel difference
+        self.retry_interval = retry_interval      # Seconds before retrying a failed read
+        self.thumb_size = thumb_size
+        self.spots = {}
+        # OCR results may arrive from worker threads
+        self.lock = threading.Lock()
+
+    def signature(self, crop):
+        """Small grayscale thumbnail used to compare crops cheaply"""
+        if crop is None or crop.size == 0:
+            return None
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        return cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def changed(self, entry, signature):
+        """True if signature shows a different vehicle than the entry was read from"""
+        if entry is None or signature is None or entry['signature'] is None:
+            return True
+        return float(np.mean(np.abs(signature - entry['signature']))) > self.change_threshold
+
+    def needs_read(self, spot, signature):
+        with self.lock:
+            entry = self.spots.get(spot)
+        if self.changed(entry, signature):
+            return True
+        # Retry spots that never produced a plate, but not on every frame
+        return entry['plate'] is None and time.time() - entry['read_at'] >= self.retry_interval
+
+    def record(self, spot, signature, plate, confidence):
+        with self.lock:
+            self.spots[spot] = {
+                'signature': signature,
+                'plate': plate,
+                'confidence': confidence,
+                'read_at': time.time(),
+            }
+
+    def mark_pending(self, spot, signature):
+        """Note that a read was queued so the same crop is not resubmitted.
+
+        A changed crop means a different vehicle, so its old plate is dropped
+        rather than shown until (or if) the new read succeeds.
+        """
+        with self.lock:
+            entry = self.spots.get(spot)
+            keep = not self.changed(entry, signature)
+            plate = entry['plate'] if keep else None
+            confidence = entry['confidence'] if keep else 0.0
+            self.spots[spot] = {
+                'signature': signature,
+                'plate': plate,
+                'confidence': confidence,
+                'read_at': time.time(),
+            }
+
+    def resolve(self, spot, signature, plate, confidence):
+        """Store an asynchronous read if the spot still shows the same crop"""
+        with self.lock:
+            entry = self.spots.get(spot)
+            if entry is None or entry['signature'] is not signature:
+                return False
+            if plate:
+                entry['plate'] = plate
+                entry['confidence'] = confidence
+            return True
+
+    def cancel(self, spot, signature):
+        """A queued read was dropped: let the next frame submit the spot again"""
+        with self.lock:
+            entry = self.spots.get(spot)
+            if entry is not None and entry['signature'] is signature:
+                entry['signature'] = None
+
+    def get_plate(self, spot):
+        with self.lock:
+            entry = self.spots.get(spot)
+            return entry['plate'] if entry else None
+
+    def tracked_spots(self):
+        with self.lock:
+            return list(self.spots)
+
+    def clear(self, spot):
+        """Forget a spot once it is empty so the next car triggers a read"""
+        with self.lock:
+            self.spots.pop(spot, None)
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from metrics import STAGE_SECONDS
+
+
+class ModelRegistry:
+    """Load each model once per process, on first use, and share it.
+
+    Heavy imports (torch, ultralytics, easyocr) happen inside the loaders,
+    so importing this module, or anything that only holds a reference to the
+    registry, stays cheap. Each key has its own lock: concurrent callers of
+    the same model wait for a single load, while different models can load
+    in parallel.
+    """
+
+    def __init__(self):
+        self.models = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, loader):
+        model = self.models.get(key)
+        if model is not None:
+            return model
+        with self.lock:
+            key_lock = self.locks.setdefault(key, threading.Lock())
+        with key_lock:
+            model = self.models.get(key)
+            if model is None:
+                started = time.perf_counter()
+                model = loader()
+                elapsed = time.perf_counter() - started
+                STAGE_SECONDS.observe(elapsed, stage='model_load')
+                print(f"Loaded {key[0]} in {elapsed:.1f}s")
+                self.models[key] = model
+        return model
+
+    def loaded(self):
+        return [key[0] for key in self.models]
+
+    def easyocr_reader(self, languages=('en',)):
+        """EasyOCR reader for a set of languages, shared by every caller"""
+        languages = tuple(languages)
+
+        def load():
+            import easyocr
+            return easyocr.Reader(list(languages))
+        return self.get(('easyocr', languages), load)
+
+    def ocr_engine(self, languages=('en',), min_confidence=0.5):
+        """TieredOCREngine (Tesseract, then EasyOCR) used for all text reading"""
+        def load():
+            from detection.ocr_engine import TieredOCREngine
+            return TieredOCREngine.from_config(tuple(languages), min_confidence)
+        return self.get(('ocr_engine', tuple(languages), min_confidence), load)
+
+    def parking_detector(self, model_path, **options):
+        """ParkingDetector for the given weights and backend options"""
+        def load():
+            from detection.model import ParkingDetector
+            return ParkingDetector(model_path, **options)
+        return self.get(('parking_detector', model_path, tuple(sorted(options.items()))), load)
+
+    def plate_detector(self, languages=('en',), min_confidence=0.5, cache_size=256, cache_ttl=300.0):
+        """PlateDetector; it reuses the shared EasyOCR reader for its languages"""
+        def load():
+            from detection.plate_detector import PlateDetector
+            return PlateDetector(list(languages), min_confidence, cache_size=cache_size, cache_ttl=cache_ttl)
+        return self.get(('plate_detector', tuple(languages), min_confidence, cache_size, cache_ttl), load)
+
+
+models = ModelRegistry()
@@ -0,0 +1,94 @@
+import numpy as np
+
+from detection.backends import nms
+
+# Input size the backends letterbox to when none is given
+DEFAULT_IMGSZ = 640
+
+
+class RegionInference:
+    """Run YOLO only where the scene changed and reuse detections elsewhere.
+
+    Each item is (camera_id, frame, regions). regions=None asks for a full
+    frame pass; otherwise only the listed (x1, y1, x2, y2) rectangles are
+    re-detected and previous detections whose centres fall outside them are
+    kept; NMS over the merged set drops duplicates of boxes that straddle a
+    region edge. Frames whose changed area is too large fall back to a full
+    pass, run at imgsz (None keeps the model's default input size). Region
+    crops are scaled by the same factor as a full pass, so a car reaches the
+    model at the same size on either path.
+    """
+
+    def __init__(self, detector, max_region_fraction=0.5, stride=32, iou=0.45, imgsz=None):
+        self.detector = detector
+        self.imgsz = imgsz
+        self.max_region_fraction = max_region_fraction
+        self.stride = stride
+        self.iou = iou
+        self.previous = {}
+        self.full_passes = 0
+        self.region_passes = 0
+
+    def needs_full_pass(self, camera_id, frame, regions):
+        if regions is None or camera_id not in self.previous:
+            return True
+        height, width = frame.shape[:2]
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        return area > self.max_region_fraction * width * height
+
+    def detect(self, items):
+        """Return {camera_id: (N, 6) detections} for every item"""
+        full = []
+        crops = []
+        for camera_id, frame, regions in items:
+            if self.needs_full_pass(camera_id, frame, regions):
+                full.append((camera_id, frame))
+            else:
+                scale = (self.imgsz or DEFAULT_IMGSZ) / max(frame.shape[:2])
+                for x1, y1, x2, y2 in regions:
+                    crops.append((camera_id, (x1, y1, x2, y2), frame[y1:y2, x1:x2], scale))
+
+        outputs = {}
+        if full:
+            results = self.detector.detect_batch([frame for _, frame in full], imgsz=self.imgsz)
+            for (camera_id, _), detections in zip(full, results):
+                outputs[camera_id] = detections
+            self.full_passes += len(full)
+
+        if crops:
+            outputs.update(self._detect_regions(items, crops))
+            self.region_passes += len(crops)
+
+        # Motion too scattered to form a region: keep the last detections
+        for camera_id, _, _ in items:
+            if camera_id not in outputs:
+                outputs[camera_id] = self.previous[camera_id]
+
+        self.previous.update(outputs)
+        return outputs
+
+    def _detect_regions(self, items, crops):
+        # Inference size for the biggest crop at the full pass's scale
+        largest = max(max(crop.shape[:2]) * scale for _, _, crop, scale in crops)
+        imgsz = int(np.ceil(largest / self.stride) * self.stride)
+        results = self.detector.detect_batch([crop for _, _, crop, _ in crops], imgsz=imgsz)
+
+        found = {}
+        for (camera_id, (x1, y1, _, _), _, _), detections in zip(crops, results):
+            detections = detections.copy()
+            detections[:, [0, 2]] += x1
+            detections[:, [1, 3]] += y1
+            found.setdefault(camera_id, []).append(detections)
+
+        outputs = {}
+        for camera_id, _, regions in items:
+            if camera_id not in found:
+                continue
+            previous = self.previous[camera_id]
+            centres_x = (previous[:, 0] + previous[:, 2]) / 2
+            centres_y = (previous[:, 1] + previous[:, 3]) / 2
+            stale = np.zeros(len(previous), dtype=bool)
+            for x1, y1, x2, y2 in regions:
+                stale |= (centres_x >= x1) & (centres_x < x2) & (centres_y >= y1) & (centres_y < y2)
+            outputs[camera_id] = nms(np.concatenate([previous[~stale]] + found[camera_id]), self.iou)
+        return outputs
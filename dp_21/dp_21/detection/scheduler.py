@@ -0,0 +1,109 @@
+import time
+from contextlib import contextmanager
+
+from detection.motion import MotionDetector
+from metrics import STAGE_SECONDS
+
+
+class AdaptiveScheduler:
+    """Decide when the detection loop should run inference.
+
+    A camera's frame is only processed when motion detection says the
+    scene changed, or when it has not been looked at for 1 / min_fps
+    seconds. Whatever the motion, every camera gets a full-frame pass at
+    least every 1 / min_fps seconds so detections outside the changed
+    regions are refreshed too. The inference rate is raised or lowered so
+    that the time spent processing stays within cpu_budget (the busy
+    fraction of the loop), clamped between min_fps and max_fps.
+    """
+
+    def __init__(self, cpu_budget=0.5, min_fps=0.5, max_fps=15.0,
+                 motion_threshold=0.01, smoothing=0.2):
+        self.cpu_budget = cpu_budget
+        self.min_interval = 1.0 / max_fps
+        self.max_interval = 1.0 / min_fps
+        self.motion_threshold = motion_threshold
+        self.smoothing = smoothing
+        self.interval = self.min_interval
+        self.next_run = 0.0
+        self.cycle_time = 0.0
+        self.motion = {}
+        self.last_processed = {}
+        self.last_full_pass = {}
+        self.stage_times = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time one pipeline stage for this cycle"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name, seconds):
+        STAGE_SECONDS.observe(seconds, stage=name)
+        average = self.stage_times.get(name, {}).get('average', seconds)
+        self.stage_times[name] = {
+            'last': seconds,
+            'average': average + self.smoothing * (seconds - average),
+        }
+
+    def time_until_ready(self, now=None):
+        now = time.perf_counter() if now is None else now
+        return max(self.next_run - now, 0.0)
+
+    def ready(self, now=None):
+        return self.time_until_ready(now) == 0.0
+
+    def should_process(self, camera_id, frame, now=None):
+        """Return (process, thumbnail, regions) for a camera's newest frame.
+
+        regions lists the changed rectangles of the frame, or is None when
+        the whole frame should be re-detected (first frame or heartbeat).
+        """
+        now = time.perf_counter() if now is None else now
+        detector = self.motion.get(camera_id)
+        if detector is None:
+            detector = self.motion[camera_id] = MotionDetector(min_changed_fraction=self.motion_threshold)
+
+        with self.stage('motion'):
+            thumbnail = detector.thumbnail(frame)
+            changed = detector.has_motion(thumbnail)
+            stale = now - self.last_processed.get(camera_id, 0.0) >= self.max_interval
+            full_due = now - self.last_full_pass.get(camera_id, 0.0) >= self.max_interval
+            regions = None
+            if changed and not full_due and detector.reference is not None:
+                regions = detector.changed_regions(thumbnail, (frame.shape[1], frame.shape[0]))
+        return changed or stale or full_due, thumbnail, regions
+
+    def mark_processed(self, camera_id, thumbnail, now=None, full=True):
+        """Record a processed frame; full=False for a region-only pass"""
+        now = time.perf_counter() if now is None else now
+        self.motion[camera_id].accept(thumbnail)
+        self.last_processed[camera_id] = now
+        if full:
+            self.last_full_pass[camera_id] = now
+
+    def skip_cycle(self, now=None):
+        """Nothing changed: look again after the shortest interval"""
+        now = time.perf_counter() if now is None else now
+        self.next_run = now + self.min_interval
+
+    def finish_cycle(self, started, now=None):
+        """Adapt the inference interval from how long this cycle took"""
+        now = time.perf_counter() if now is None else now
+        elapsed = now - started
+        self.cycle_time += self.smoothing * (elapsed - self.cycle_time)
+        # Stay within the budget: busy time / interval <= cpu_budget
+        target = self.cycle_time / self.cpu_budget if self.cpu_budget > 0 else 0.0
+        self.interval = min(max(target, self.min_interval), self.max_interval)
+        self.next_run = started + self.interval
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'fps': 1.0 / self.interval if self.interval else 0.0,
+            'cycle_time': self.cycle_time,
+            'stages': dict(self.stage_times),
+        }
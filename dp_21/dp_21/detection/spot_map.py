@@ -0,0 +1,126 @@
+import json
+import os
+import cv2
+import numpy as np
+
+
+class SpotMap:
+    """Parking spot layout for one camera, precomputed into a label raster.
+
+    Spots are arbitrary polygons given in the coordinates of reference_size
+    (or normalised 0-1 coordinates when reference_size is None). They are
+    rasterised once at the working resolution so assigning a detection to
+    a spot is a single array lookup. Where polygons overlap, the spot listed
+    last wins.
+    """
+
+    def __init__(self, polygons, size, reference_size=None):
+        # size and reference_size are (width, height)
+        self.polygons = {spot_id: np.asarray(points, dtype=np.float32)
+                         for spot_id, points in polygons.items()}
+        self.reference_size = tuple(reference_size) if reference_size else None
+        self.spot_ids = list(self.polygons)
+        # Label 0 means "no spot"; label i maps to spot_ids[i - 1]
+        self.labels = np.array([None] + self.spot_ids, dtype=object)
+        self.size = None
+        self.raster = None
+        self.resize(size)
+
+    def resize(self, size):
+        """Rebuild the label raster for a new working resolution"""
+        width, height = int(size[0]), int(size[1])
+        if self.size == (width, height):
+            return self
+        dtype = np.uint16 if len(self.spot_ids) < np.iinfo(np.uint16).max else np.int32
+        raster = np.zeros((height, width), dtype=dtype)
+        for label, spot_id in enumerate(self.spot_ids, start=1):
+            points = np.round(self.scaled_polygon(spot_id, (width, height))).astype(np.int32)
+            cv2.fillPoly(raster, [points], color=label)
+        self.size = (width, height)
+        self.raster = raster
+        return self
+
+    def scaled_polygon(self, spot_id, size=None):
+        """Polygon of a spot in pixel coordinates of size (default: working size)"""
+        width, height = size or self.size
+        ref_width, ref_height = self.reference_size or (1.0, 1.0)
+        return self.polygons[spot_id] * np.array([width / ref_width, height / ref_height], dtype=np.float32)
+
+    def label_at(self, x, y):
+        """Raster label at pixel (x, y): 0 for no spot, else index into spot_ids plus one"""
+        width, height = self.size
+        x, y = int(x), int(y)
+        if x < 0 or y < 0 or x >= width or y >= height:
+            return 0
+        return int(self.raster[y, x])
+
+    def labels_at(self, xs, ys):
+        """label_at for arrays of pixel coordinates"""
+        width, height = self.size
+        xs = np.asarray(xs, dtype=np.intp)
+        ys = np.asarray(ys, dtype=np.intp)
+        inside = (xs >= 0) & (ys >= 0) & (xs < width) & (ys < height)
+        labels = np.zeros(len(xs), dtype=np.intp)
+        labels[inside] = self.raster[ys[inside], xs[inside]]
+        return labels
+
+    def assign(self, detections, min_confidence=0.0):
+        """Match a frame's (N, 6) detections to spots by box centre in one pass.
+
+        Returns (table, indices): the detections at or above min_confidence
+        whose centre lies on a spot, and each row's index into spot_ids.
+        """
+        detections = detections[detections[:, 4] >= min_confidence]
+        boxes = detections[:, :4].astype(np.intp)
+        labels = self.labels_at((boxes[:, 0] + boxes[:, 2]) // 2, (boxes[:, 1] + boxes[:, 3]) // 2)
+        on_spot = labels > 0
+        return detections[on_spot], labels[on_spot] - 1
+
+    def lookup(self, x, y):
+        """Spot id containing pixel (x, y), or None"""
+        return self.labels[self.label_at(x, y)]
+
+    def lookup_box(self, x1, y1, x2, y2):
+        """Spot id under the centre of a bounding box, or None"""
+        return self.lookup((x1 + x2) // 2, (y1 + y2) // 2)
+
+    @classmethod
+    def grid(cls, rows, cols, size, start=1):
+        """Evenly split the frame into rows x cols spots, numbered row by row"""
+        polygons = {}
+        spot_id = start
+        for row in range(rows):
+            for col in range(cols):
+                x1, y1 = col / cols, row / rows
+                x2, y2 = (col + 1) / cols, (row + 1) / rows
+                polygons[spot_id] = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+                spot_id += 1
+        return cls(polygons, size)
+
+    @classmethod
+    def from_rectangles(cls, rectangles, size, reference_size=None):
+        """Build a map from {spot_id: (x1, y1, x2, y2)} rectangles"""
+        polygons = {spot_id: [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+                    for spot_id, (x1, y1, x2, y2) in rectangles.items()}
+        return cls(polygons, size, reference_size or size)
+
+    @classmethod
+    def from_file(cls, path, size):
+        """Load a layout saved as {"reference_size": [w, h], "spots": {id: [[x, y], ...]}}"""
+        with open(path) as f:
+            layout = json.load(f)
+        polygons = {}
+        for spot_id, points in layout['spots'].items():
+            # JSON keys are strings; keep numeric ids as ints like ParkingState
+            polygons[int(spot_id) if str(spot_id).isdigit() else spot_id] = points
+        return cls(polygons, size, layout.get('reference_size'))
+
+    @classmethod
+    def for_camera(cls, camera_id, size, map_dir='spot_maps', default_grid=(2, 6)):
+        """Load spot_maps/<camera_id>.json, falling back to the default grid"""
+        path = os.path.join(map_dir, f"{camera_id}.json")
+        if os.path.exists(path):
+            print(f"Loading spot map for {camera_id} from {path}")
+            return cls.from_file(path, size)
+        print(f"No spot map found for {camera_id}, using a {default_grid[0]}x{default_grid[1]} grid")
+        return cls.grid(default_grid[0], default_grid[1], size)
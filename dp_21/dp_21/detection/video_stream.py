@@ -1,43 +1,184 @@
 import cv2
+import os
 from threading import Thread
 import queue
+import time
+
+from metrics import CAMERA_FPS, CAMERA_LAG, CAMERA_RECONNECTS, FRAMES_CAPTURED, FRAMES_DROPPED, STAGE_SECONDS
 
 class VideoStream:
-    def __init__(self, url):
-        self.stream = cv2.VideoCapture(url)
-        self.stream.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        self.stream.set(cv2.CAP_PROP_FPS, 30)
-        self.stream.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.stream.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    """Threaded camera reader that reconnects with exponential backoff.
+
+    decoder selects how the stream is opened:
+      'default'   - cv2.VideoCapture with OpenCV's preferred backend
+      'ffmpeg'    - FFmpeg with low-latency flags and hardware decode if available
+      'gstreamer' - GStreamer pipeline that decodes and scales straight to
+                    frame_size (or capture_size; native size if neither is set)
+    Frames are resized to frame_size (width, height) when the decoder did not
+    already produce that size; with frame_size=None they keep the camera's
+    resolution. capture_size, if given, is requested from the camera.
+    """
+
+    def __init__(self, url, name='camera', frame_size=None, decoder='default',
+                 backoff_initial=0.5, backoff_max=30.0, capture_size=None):
+        self.url = url
+        self.name = name
+        self.frame_size = frame_size
+        self.capture_size = capture_size
+        self.decoder = decoder
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        # Current retry delay; only a decoded frame resets it
+        self.backoff = backoff_initial
+        self.stream = None
         self.queue = queue.Queue(maxsize=2)
         self.stopped = False
-        
+
+        # Health counters
+        self.connected = False
+        self.reconnects = 0
+        self.frames = 0
+        self.fps = 0.0
+        self.last_frame_time = None
+        self.lag = 0.0
+
+    def _open(self):
+        if self.decoder == 'gstreamer':
+            caps = "video/x-raw,format=BGR"
+            size = self.frame_size or self.capture_size
+            if size:
+                caps += f",width={size[0]},height={size[1]}"
+            pipeline = (
+                f"uridecodebin uri={self.url} ! videoconvert ! videoscale ! {caps} ! "
+                "appsink drop=true max-buffers=1 sync=false"
+            )
+            return cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+
+        if self.decoder == 'ffmpeg':
+            # Don't buffer ahead; we only ever want the newest frame
+            os.environ.setdefault('OPENCV_FFMPEG_CAPTURE_OPTIONS', 'fflags;nobuffer|flags;low_delay')
+            stream = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG,
+                                      [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        else:
+            stream = cv2.VideoCapture(self.url)
+        stream.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        stream.set(cv2.CAP_PROP_FPS, 30)
+        if self.capture_size:
+            stream.set(cv2.CAP_PROP_FRAME_WIDTH, self.capture_size[0])
+            stream.set(cv2.CAP_PROP_FRAME_HEIGHT, self.capture_size[1])
+        return stream
+
+    def _wait_backoff(self):
+        time.sleep(self.backoff)
+        self.backoff = min(self.backoff * 2, self.backoff_max)
+
+    def _connect(self):
+        """Open the stream, retrying with exponential backoff until stopped"""
+        while not self.stopped:
+            self.stream = self._open()
+            if self.stream.isOpened():
+                self.connected = True
+                print(f"Camera {self.name} connected")
+                return True
+            self.stream.release()
+            print(f"Camera {self.name} unavailable, retrying in {self.backoff:.1f}s")
+            self._wait_backoff()
+        return False
+
+    def _disconnect(self):
+        self.connected = False
+        if self.stream is not None:
+            self.stream.release()
+            self.stream = None
+
+    def frames_forever(self):
+        """Yield frames, reconnecting whenever the stream fails, until stopped"""
+        while not self.stopped:
+            if not self.connected and not self._connect():
+                return
+            started = time.perf_counter()
+            ret, frame = self.stream.read()
+            if not ret:
+                # A source can accept connections and still never deliver a frame
+                print(f"Camera {self.name} read failed, reconnecting in {self.backoff:.1f}s")
+                self._disconnect()
+                self.reconnects += 1
+                CAMERA_RECONNECTS.inc(camera=self.name)
+                self._wait_backoff()
+                continue
+            self.backoff = self.backoff_initial
+            if self.frame_size and (frame.shape[1], frame.shape[0]) != tuple(self.frame_size):
+                frame = cv2.resize(frame, tuple(self.frame_size))
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage='capture')
+            self._record_frame()
+            yield frame
+        self._disconnect()
+
+    def _record_frame(self):
+        now = time.time()
+        if self.last_frame_time is not None:
+            interval = now - self.last_frame_time
+            if interval > 0:
+                self.fps += 0.1 * (1.0 / interval - self.fps)
+        self.last_frame_time = now
+        self.frames += 1
+        FRAMES_CAPTURED.inc(camera=self.name)
+        CAMERA_FPS.set(round(self.fps, 2), camera=self.name)
+
     def start(self):
-        thread = Thread(target=self.update, args=())
+        thread = Thread(target=self.update, args=(), name=f"capture-{self.name}")
         thread.daemon = True
         thread.start()
         return self
-        
+
     def update(self):
-        while True:
-            if self.stopped:
-                return
+        for frame in self.frames_forever():
             if self.queue.full():
                 try:
                     self.queue.get_nowait()
+                    FRAMES_DROPPED.inc(camera=self.name)
                 except queue.Empty:
                     pass
-            ret, frame = self.stream.read()
-            if not ret:
-                self.stop()
-                return
-            self.queue.put(frame)
-                
-    def read(self):
-        return self.queue.get()
-        
+            self.queue.put((time.time(), frame))
+
+    def _consume(self, item):
+        captured_at, frame = item
+        self.lag = time.time() - captured_at
+        CAMERA_LAG.set(round(self.lag, 4), camera=self.name)
+        return frame
+
+    def read(self, timeout=1.0):
+        """Wait up to timeout seconds for the next frame; None if none arrived"""
+        try:
+            return self._consume(self.queue.get(timeout=timeout))
+        except queue.Empty:
+            return None
+
+    def read_latest(self):
+        """Return the newest queued frame without blocking, or None"""
+        item = None
+        while True:
+            try:
+                newer = self.queue.get_nowait()
+            except queue.Empty:
+                return self._consume(item) if item is not None else None
+            if item is not None:
+                FRAMES_DROPPED.inc(camera=self.name)
+            item = newer
+
+    def health(self):
+        since_last = time.time() - self.last_frame_time if self.last_frame_time else None
+        return {
+            'camera': self.name,
+            'connected': self.connected,
+            'fps': round(self.fps, 2),
+            'lag': round(self.lag, 4),
+            'seconds_since_last_frame': since_last,
+            'frames': self.frames,
+            'reconnects': self.reconnects,
+        }
+
     def stop(self):
         self.stopped = True
-        self.stream.release()
-
-    # Add your existing VideoStream methods here 
\ No newline at end of file
+        if self.stream is not None:
+            self.stream.release()
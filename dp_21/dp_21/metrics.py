@@ -0,0 +1,286 @@
+import bisect
+import multiprocessing as mp
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Lightweight in-process metrics rendered in the Prometheus text format.
+# Counters, gauges and fixed-bucket histograms keep one small lock each, so
+# recording a value on the hot path costs a dict lookup and an addition.
+# Child processes (capture, OCR workers) record into their own copy of the
+# registry and periodically send it to the parent, which adds their values
+# to its own when /metrics is rendered.
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self.lock:
+            return self.values.get(_label_key(labels), 0)
+
+    def export(self):
+        with self.lock:
+            return dict(self.values)
+
+    def reset(self):
+        with self.lock:
+            self.values.clear()
+
+    @staticmethod
+    def _merge(values, other):
+        for key, value in other.items():
+            values[key] = values.get(key, 0) + value
+
+    def samples(self, remote=()):
+        """Own samples plus the exported values of other processes"""
+        values = self.export()
+        for other in remote:
+            self._merge(values, other)
+        return [(self.name, key, value) for key, value in values.items()]
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[_label_key(labels)] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @staticmethod
+    def _merge(values, other):
+        # A gauge reports a current value, so another process's reading replaces ours
+        values.update(other)
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), then sum
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def export(self):
+        with self.lock:
+            return {key: [list(counts), total] for key, (counts, total) in self.series.items()}
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+    def samples(self, remote=()):
+        """Own samples plus the exported series of other processes"""
+        series = self.export()
+        for other in remote:
+            for key, (counts, total) in other.items():
+                merged = series.setdefault(key, [[0] * len(counts), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+        samples = []
+        for key, (counts, total) in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                samples.append((f'{self.name}_bucket', key + (('le', le),), cumulative))
+            samples.append((f'{self.name}_sum', key, total))
+            samples.append((f'{self.name}_count', key, cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        # Latest export from each child process, keyed by source
+        self.remote = {}
+        self.remote_lock = threading.Lock()
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text):
+        return self.register(Counter(name, help_text))
+
+    def gauge(self, name, help_text):
+        return self.register(Gauge(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, buckets))
+
+    def export(self):
+        """Picklable copy of every metric's values, for sending to the parent"""
+        return {metric.name: metric.export() for metric in self.metrics}
+
+    def reset(self):
+        for metric in self.metrics:
+            metric.reset()
+
+    def receive(self, source, exported):
+        """Store a child process's export; it replaces that source's previous one"""
+        with self.remote_lock:
+            self.remote[source] = exported
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self.remote_lock:
+            remote = list(self.remote.values())
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            others = [exported[metric.name] for exported in remote if metric.name in exported]
+            for name, key, value in metric.samples(others):
+                lines.append(f'{name}{_format_labels(key)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsForwarder:
+    """Send this process's registry to the parent every interval seconds.
+
+    Exports are cumulative, so a lost or late message is made up for by the
+    next one; the parent keeps only the newest export per source.
+    """
+
+    def __init__(self, queue, source, interval=5.0):
+        self.queue = queue
+        self.source = source
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def start(self):
+        thread = threading.Thread(target=self._loop, name='metrics-forwarder', daemon=True)
+        thread.start()
+        return self
+
+    def _loop(self):
+        while not self.stopped.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        try:
+            self.queue.put((self.source, registry.export()))
+        except Exception as e:
+            print(f"Error forwarding metrics: {e}")
+
+    def stop(self):
+        self.stopped.set()
+        self.flush()
+
+
+registry = Registry()
+_child_queue = None
+_child_queue_lock = threading.Lock()
+
+
+def child_metrics_queue():
+    """Queue child processes send their metrics on; read by a thread in this process"""
+    global _child_queue
+    with _child_queue_lock:
+        if _child_queue is None:
+            _child_queue = mp.Queue()
+            thread = threading.Thread(target=_receive_loop, args=(_child_queue,),
+                                      name='metrics-receiver', daemon=True)
+            thread.start()
+        return _child_queue
+
+
+def _receive_loop(queue):
+    while True:
+        try:
+            source, exported = queue.get()
+        except (EOFError, OSError):
+            return
+        registry.receive(source, exported)
+
+
+def forward_metrics(queue, name, interval=5.0):
+    """Call in a child process to report its metrics through queue"""
+    # A forked child starts with a copy of the parent's values; count only its own
+    registry.reset()
+    return MetricsForwarder(queue, f'{name}-{os.getpid()}', interval).start()
+
+STAGE_SECONDS = registry.histogram(
+    'parking_stage_seconds', 'Time spent in each pipeline stage')
+FRAMES_CAPTURED = registry.counter(
+    'parking_frames_captured_total', 'Frames read from each camera')
+CAMERA_FPS = registry.gauge(
+    'parking_camera_fps', 'Smoothed capture frame rate per camera')
+CAMERA_LAG = registry.gauge(
+    'parking_camera_lag_seconds', 'Age of the newest frame when the detection loop took it')
+CAMERA_RECONNECTS = registry.counter(
+    'parking_camera_reconnects_total', 'Times a camera stream failed and was reopened')
+FRAMES_DROPPED = registry.counter(
+    'parking_frames_dropped_total', 'Frames discarded by VideoStream because the consumer was behind')
+OCR_CALLS = registry.counter(
+    'parking_ocr_calls_total', 'Plate reads that reached the OCR engine (cache misses)')
+PLATE_LOCATIONS = registry.counter(
+    'parking_plate_locations_total', 'Vehicle crops searched for plates, by result (found or none)')
+OCR_TIER_CALLS = registry.counter(
+    'parking_ocr_tier_calls_total', 'OCR tier attempts by tier and result (accepted or escalated)')
+OCR_JOBS_DROPPED = registry.counter(
+    'parking_ocr_jobs_dropped_total', 'Spot crops dropped from a full OCR queue')
+PLATE_CACHE_LOOKUPS = registry.counter(
+    'parking_plate_cache_lookups_total', 'Plate cache lookups by result (hit or miss)')
+HISTORY_EVENTS_WRITTEN = registry.counter(
+    'parking_history_events_written_total', 'Occupancy events committed to the history database')
+HISTORY_EVENTS_DROPPED = registry.counter(
+    'parking_history_events_dropped_total', 'Occupancy events lost to a full queue or a write error')
+INGEST_BATCHES = registry.counter(
+    'parking_ingest_batches_total', 'Remote detector batches by result (applied or duplicate)')
+SOCKET_EMITS = registry.counter(
+    'parking_socket_emits_total', 'Socket.IO messages sent by event')
+STREAM_FRAMES_SENT = registry.counter(
+    'parking_stream_frames_sent_total', 'MJPEG frames written to /video_feed clients')
+STREAM_CLIENTS = registry.gauge(
+    'parking_stream_clients', 'Connected /video_feed clients')
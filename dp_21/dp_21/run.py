@@ -1,64 +1,156 @@
-from app import create_app
-from detection.model import ParkingDetector
+from app import create_app, socketio
 from detection.video_stream import VideoStream
-from detection.plate_detector import PlateDetector
-from app.parking_state import parking_state
+from detection.frame_ring import RingVideoStream
+from detection.registry import models
+from detection.multi_camera import MultiCameraEngine
+from detection.spot_map import SpotMap
+from detection.scheduler import AdaptiveScheduler
+from detection.plate_tracker import SpotPlateTracker
+from detection.ocr_worker import OCRWorkerPool
+from app.parking_state import parking_state, ParkingState
+from app.frame_broadcaster import frame_broadcaster
+from app.history import occupancy_history
+from app.rollups import occupancy_rollups
+from metrics import STAGE_SECONDS
 import cv2
 import time
 import threading
 import numpy as np
-from collections import deque
 import concurrent.futures
 import os
 import sys
-import easyocr
-from flask import jsonify, request
-from flask_socketio import SocketIO
-import pytesseract
 
 # Set HEADLESS_MODE to False to display the video window
 HEADLESS_MODE = False
 
 # Ensure config.py exists and can be imported
 try:
-    from config import get_video_url, MODEL_PATH, OCR_LANGUAGES, MIN_OCR_CONFIDENCE
+    from config import get_video_url, get_camera_urls, MODEL_PATH, OCR_LANGUAGES, MIN_OCR_CONFIDENCE
+    from config import OCR_WORKERS, OCR_QUEUE_SIZE, OCR_USE_PROCESSES
+    from config import PLATE_CACHE_SIZE, PLATE_CACHE_TTL, SPOT_MAP_DIR
+    from config import SCHEDULER_CPU_BUDGET, SCHEDULER_MIN_FPS, SCHEDULER_MAX_FPS, MOTION_THRESHOLD
+    from config import ROI_MAX_FRACTION, INFERENCE_IMGSZ
+    from config import INFERENCE_BACKEND, ONNX_INT8, CALIBRATION_IMAGE_DIR
+    from config import CAPTURE_IN_PROCESS, CAPTURE_FRAME_SHAPE, CAPTURE_DECODER
+    from config import CAPTURE_RESOLUTION, DETECTION_FRAME_SIZE
 except ImportError as e:
     print(f"Error importing config: {e}")
     print("Using default configuration")
     def get_video_url():
         return "http://100.109.214.6:4747/video"
+    def get_camera_urls():
+        return {'cam1': get_video_url()}
     MODEL_PATH = r"C:\vs_code\dp_21\dp_21\smart_parking\weights\best.pt"
     OCR_LANGUAGES = ['en']
     MIN_OCR_CONFIDENCE = 0.6
+    OCR_WORKERS = 2
+    OCR_QUEUE_SIZE = 32
+    OCR_USE_PROCESSES = False
+    PLATE_CACHE_SIZE = 256
+    PLATE_CACHE_TTL = 300.0
+    SPOT_MAP_DIR = 'spot_maps'
+    SCHEDULER_CPU_BUDGET = 0.5
+    SCHEDULER_MIN_FPS = 0.5
+    SCHEDULER_MAX_FPS = 15.0
+    MOTION_THRESHOLD = 0.01
+    ROI_MAX_FRACTION = 0.5
+    INFERENCE_IMGSZ = None
+    INFERENCE_BACKEND = 'auto'
+    ONNX_INT8 = False
+    CALIBRATION_IMAGE_DIR = None
+    CAPTURE_IN_PROCESS = False
+    CAPTURE_FRAME_SHAPE = (480, 640, 3)
+    CAPTURE_DECODER = 'default'
+    CAPTURE_RESOLUTION = None
+    DETECTION_FRAME_SIZE = (320, 240)
 
 # Import configuration
 VIDEO_URL = get_video_url()
 print(f"Using video URL: {VIDEO_URL}")
+CAMERA_URLS = get_camera_urls()
+PRIMARY_CAMERA = next(iter(CAMERA_URLS))
+print(f"Configured cameras: {', '.join(CAMERA_URLS)}")
 
 # Verify model path exists
 if not os.path.exists(MODEL_PATH):
     print(f"WARNING: Model file not found at {MODEL_PATH}")
     print("Please check the path in config.py")
 
-# Frame buffer for smooth streaming
-frame_buffer = deque(maxlen=3)
+# Latest annotated frame; encoded JPEGs go to frame_broadcaster
 latest_frame = None
 processing_lock = threading.Lock()
 
-# Set a frame skip interval
-FRAME_SKIP_INTERVAL = 2  # Process every 2nd frame
-frame_count = 0
-
-# Initialize the plate detector
-try:
-    plate_detector = PlateDetector(OCR_LANGUAGES, MIN_OCR_CONFIDENCE)
-    print("Plate detector initialized successfully")
-except Exception as e:
-    print(f"Error initializing plate detector: {e}")
-    plate_detector = None
+# Models are loaded on first use through the shared registry, not at import
+def get_plate_detector():
+    try:
+        return models.plate_detector(OCR_LANGUAGES, MIN_OCR_CONFIDENCE,
+                                     cache_size=PLATE_CACHE_SIZE, cache_ttl=PLATE_CACHE_TTL)
+    except Exception as e:
+        print(f"Error initializing plate detector: {e}")
+        return None
 
-# Initialize the OCR reader
-reader = easyocr.Reader(['en'])
+def get_detector():
+    return models.parking_detector(MODEL_PATH, backend=INFERENCE_BACKEND, int8=ONNX_INT8,
+                                   calibration_dir=CALIBRATION_IMAGE_DIR)
+
+# Working resolution the detection loop resizes frames to; plates are read from the original
+FRAME_SIZE = DETECTION_FRAME_SIZE
+
+# Per-camera spot layouts, rasterised at the working resolution
+spot_maps = {}
+
+def get_spot_map(camera_id, frame_shape=None):
+    spot_map = spot_maps.get(camera_id)
+    if spot_map is None:
+        spot_map = SpotMap.for_camera(camera_id, FRAME_SIZE, SPOT_MAP_DIR)
+        spot_maps[camera_id] = spot_map
+    if frame_shape is not None:
+        spot_map.resize((frame_shape[1], frame_shape[0]))
+    return spot_map
+
+# Per-camera trackers that decide when a spot needs a fresh plate read
+plate_trackers = {}
+
+def get_plate_tracker(camera_id):
+    if camera_id not in plate_trackers:
+        plate_trackers[camera_id] = SpotPlateTracker()
+    return plate_trackers[camera_id]
+
+# Plate OCR runs in its own worker pool, started with the detection loop
+ocr_pool = None
+
+def handle_ocr_result(job_key, plate, confidence, context):
+    """Merge a finished plate read back into the camera's parking state"""
+    camera_id, spot_number = job_key
+    tracker, state, signature = context
+    if tracker.resolve(spot_number, signature, plate, confidence) and plate:
+        update_parking_state(spot_number, plate, state)
+
+def handle_ocr_drop(job_key, context):
+    """A crop fell off the full OCR queue; make its spot eligible for another read"""
+    camera_id, spot_number = job_key
+    tracker, state, signature = context
+    tracker.cancel(spot_number, signature)
+
+def start_ocr_pool():
+    global ocr_pool
+    # Process workers load their own detector; don't load one here for nothing
+    plate_detector = None if OCR_USE_PROCESSES else get_plate_detector()
+    if plate_detector is None and not OCR_USE_PROCESSES:
+        print("Plate detector unavailable, OCR disabled")
+        return None
+    ocr_pool = OCRWorkerPool(
+        handle_ocr_result,
+        detector=plate_detector,
+        workers=OCR_WORKERS,
+        queue_size=OCR_QUEUE_SIZE,
+        use_processes=OCR_USE_PROCESSES,
+        languages=OCR_LANGUAGES,
+        min_confidence=MIN_OCR_CONFIDENCE,
+        on_drop=handle_ocr_drop,
+    ).start()
+    print(f"OCR worker pool started with {OCR_WORKERS} workers")
+    return ocr_pool
 
 def process_frame_for_web(frame):
     """Optimize frame for web streaming"""
@@ -70,7 +162,8 @@ def process_frame_for_web(frame):
         frame = cv2.resize(frame, dim, interpolation=cv2.INTER_AREA)
         
         encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 85]
-        _, buffer = cv2.imencode('.jpg', frame, encode_param)
+        with STAGE_SECONDS.time(stage='jpeg_encode'):
+            _, buffer = cv2.imencode('.jpg', frame, encode_param)
         return buffer.tobytes()
     except Exception as e:
         print(f"Error processing frame for web: {e}")
@@ -78,141 +171,169 @@ def process_frame_for_web(frame):
 
 def detect_numbers(frame):
     """Detect numbers in the given frame using OCR."""
-    results = reader.readtext(frame)
-    detected_numbers = []
-    
-    for (bbox, text, prob) in results:
-        detected_numbers.append(text)
-    
-    return detected_numbers
-
-def process_detections(frame, results):
+    text = models.ocr_engine(OCR_LANGUAGES, MIN_OCR_CONFIDENCE).read_text(frame)
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+def process_detections(frame, detections, state=parking_state, camera_id=PRIMARY_CAMERA, original=None):
+    """Apply one frame's (N, 6) detections: x1, y1, x2, y2, conf, cls.
+
+    Detections are in frame's coordinates. If the full-resolution original
+    is given, boxes are mapped back to it and plate crops are cut from it.
+    """
     global latest_frame
+    if original is None:
+        original = frame
     detection_frame = frame.copy()
-    current_detections = {i: {'status': 'empty', 'plate': None} for i in range(1, 13)}
-
-    # Detect numbers in the frame
-    detected_numbers = detect_numbers(frame)
-
-    # Create a mapping of detected numbers to their respective slots
-    for result in results:
-        boxes = result.boxes
-        for box in boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            cls = int(box.cls[0])
-            conf = float(box.conf[0])
-
-            if conf < 0.3:
-                continue
-
-            spot_number = determine_spot_number(x1, y1, x2, y2, frame.shape)
-            if spot_number is not None:
-                status = 'occupied' if cls == 1 else 'empty'
-                
-                if status == 'occupied':
-                    # Associate detected number with the parking slot
-                    if detected_numbers:
-                        # Use the detected number corresponding to the current slot
-                        current_detections[spot_number]['plate'] = detected_numbers.pop(0)  # Get the first detected number
-
-                current_detections[spot_number]['status'] = status
-
-                # Emit the detected plate number to the frontend
-                if current_detections[spot_number]['plate']:
-                    update_parking_state(spot_number, current_detections[spot_number]['plate'])
-
-                # Draw bounding boxes and display the detected number
-                color = (0, 0, 255) if status == 'occupied' else (0, 255, 0)
-                cv2.rectangle(detection_frame, (x1, y1), (x2, y2), color, 2)
-                
-                cv2.putText(detection_frame, f"Spot {spot_number}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-                if current_detections[spot_number]['plate']:
-                    cv2.putText(detection_frame, f"Plate: {current_detections[spot_number]['plate']}", (x1, y2 + 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    spot_map = get_spot_map(camera_id, frame.shape)
+    tracker = get_plate_tracker(camera_id)
+
+    # Confidence filter and spot assignment for the whole frame at once
+    table, indices = spot_map.assign(detections, min_confidence=0.3)
+    is_occupied = table[:, 5].astype(int) == 1
+
+    # One observation per spot: empty with full confidence unless a box says
+    # otherwise; where boxes share a spot the most confident one decides
+    spot_ids = spot_map.spot_ids
+    occupied = np.zeros(len(spot_ids), dtype=bool)
+    confidences = np.ones(len(spot_ids), dtype=np.float32)
+    confidences[indices] = 0.0
+    np.maximum.at(confidences, indices, table[:, 4])
+    best = table[:, 4] == confidences[indices]
+    occupied[indices[best]] = is_occupied[best]
+
+    # Read plates from the full-resolution crops of occupied spots, only when new or changed
+    plates = {}
+    scale_x = original.shape[1] / frame.shape[1]
+    scale_y = original.shape[0] / frame.shape[0]
+    original_boxes = (table[:, :4] * np.array([scale_x, scale_y, scale_x, scale_y])).astype(int)
+    for index, box in zip(indices[is_occupied].tolist(), original_boxes[is_occupied].tolist()):
+        spot_number = spot_ids[index]
+        plate = read_spot_plate(tracker, spot_number, original, tuple(box), state, camera_id)
+        if plate:
+            plates[spot_number] = plate
+
+    # Draw bounding boxes and display the detected number
+    for (x1, y1, x2, y2), index, spot_occupied in zip(table[:, :4].astype(int).tolist(), indices.tolist(),
+                                                       is_occupied.tolist()):
+        spot_number = spot_ids[index]
+        color = (0, 0, 255) if spot_occupied else (0, 255, 0)
+        cv2.rectangle(detection_frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(detection_frame, f"Spot {spot_number}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        plate = plates.get(spot_number) if spot_occupied else None
+        if plate:
+            cv2.putText(detection_frame, f"Plate: {plate}", (x1, y2 + 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
 
     # Update the parking state with detected numbers
-    parking_state.update_spots_from_detection(current_detections)
-    
+    with STAGE_SECONDS.time(stage='state_update'):
+        transitions = state.update_spots_from_arrays(spot_ids, occupied, confidences, plates)
+
+    # Forget a spot's plate only once it is confirmed empty; a car that is
+    # still being debounced keeps its pending read
+    for spot_number, _, new_status, _ in transitions:
+        if new_status == 'empty':
+            tracker.clear(spot_number)
+
+    # Only the primary camera feeds the web video stream
+    if camera_id != PRIMARY_CAMERA:
+        return detection_frame
+
     with processing_lock:
         latest_frame = detection_frame
-        web_frame = process_frame_for_web(detection_frame)
-        if web_frame:
-            frame_buffer.append(web_frame)
+
+    # Encode once; every /video_feed client shares these bytes
+    web_frame = process_frame_for_web(detection_frame)
+    if web_frame:
+        frame_broadcaster.publish(web_frame)
 
     return detection_frame
 
-def determine_spot_number(x1, y1, x2, y2, frame_shape):
-    height, width = frame_shape[:2]
-    center_x = (x1 + x2) // 2
-    center_y = (y1 + y2) // 2
-    
-    if center_y < height // 2:
-        spot = int((center_x / width) * 6) + 1
-        return spot if 1 <= spot <= 6 else None
-    else:
-        spot = int((center_x / width) * 6) + 7
-        return spot if 7 <= spot <= 12 else None
+def read_spot_plate(tracker, spot_number, frame, bbox, state, camera_id):
+    """Queue plate OCR for a spot's crop if the tracker says it changed.
+
+    Returns the plate currently known for the spot; a new read is merged
+    into the parking state by handle_ocr_result once a worker finishes.
+    """
+    x1, y1, x2, y2 = bbox
+    crop = frame[max(y1, 0):y2, max(x1, 0):x2]
+    signature = tracker.signature(crop)
+    if ocr_pool is not None and crop.size and tracker.needs_read(spot_number, signature):
+        tracker.mark_pending(spot_number, signature)
+        ocr_pool.submit((camera_id, spot_number), crop.copy(), (tracker, state, signature))
+    return tracker.get_plate(spot_number)
 
 def process_frame(frame):
-    global detector
-    results = detector.detect(frame)
-    detection_frame = process_detections(frame, results)
+    detections = get_detector().detect(frame)
+    detection_frame = process_detections(frame, detections)
     return detection_frame
 
+def build_camera_engine(detector):
+    """Create one VideoStream and ParkingState per configured camera"""
+    streams = {}
+    states = {}
+    for camera_id, url in CAMERA_URLS.items():
+        print(f"Initializing video stream {camera_id} from: {url}")
+        if CAPTURE_IN_PROCESS:
+            # Ring slots are sized from CAPTURE_RESOLUTION or the camera's native frames
+            streams[camera_id] = RingVideoStream(url, name=camera_id, decoder=CAPTURE_DECODER,
+                                                 capture_size=CAPTURE_RESOLUTION,
+                                                 fallback_shape=CAPTURE_FRAME_SHAPE)
+        else:
+            # Keep the camera's resolution; the engine scales a copy down for inference
+            streams[camera_id] = VideoStream(url, name=camera_id, decoder=CAPTURE_DECODER,
+                                             capture_size=CAPTURE_RESOLUTION)
+        spot_ids = get_spot_map(camera_id).spot_ids
+        # The primary camera keeps the shared state served by the web app
+        if camera_id == PRIMARY_CAMERA:
+            parking_state.camera_id = camera_id
+            parking_state.reset_spots(spot_ids)
+            states[camera_id] = parking_state
+        else:
+            states[camera_id] = ParkingState(spot_ids, camera_id)
+            # create_app already logs the primary camera's state
+            occupancy_history.attach(states[camera_id])
+            occupancy_rollups.attach(states[camera_id], occupancy_history)
+    scheduler = AdaptiveScheduler(
+        cpu_budget=SCHEDULER_CPU_BUDGET,
+        min_fps=SCHEDULER_MIN_FPS,
+        max_fps=SCHEDULER_MAX_FPS,
+        motion_threshold=MOTION_THRESHOLD,
+    )
+    return MultiCameraEngine(detector, streams, states, process_detections,
+                             frame_size=FRAME_SIZE, scheduler=scheduler,
+                             max_region_fraction=ROI_MAX_FRACTION, imgsz=INFERENCE_IMGSZ)
+
 def run_detection():
     global HEADLESS_MODE
+    engine = None
     try:
-        print(f"Initializing video stream from: {VIDEO_URL}")
-        vs = VideoStream(VIDEO_URL).start()
         print("Initializing detector...")
-        detector = ParkingDetector(MODEL_PATH)
+        detector = get_detector()
         print("Detector initialized with model:", MODEL_PATH)
+        start_ocr_pool()
+        engine = build_camera_engine(detector).start()
         time.sleep(2.0)
-        
-        target_fps = 30  # Aim for 30 FPS
-        last_time = time.time()
-
-        while True:
-            frame = vs.read()
-            if frame is None:
-                print("No frame received, retrying...")
-                time.sleep(0.1)  # Reduce retry delay
-                continue
-
-            # Resize frame for faster processing
-            frame = cv2.resize(frame, (320, 240))
-
-            # Increment frame count and skip frames based on the interval
-            global frame_count
-            frame_count += 1
-            if frame_count % FRAME_SKIP_INTERVAL != 0:
-                continue  # Skip processing this frame
-
-            results = detector.detect(frame)
-            detection_frame = process_detections(frame, results)
 
+        # The engine's scheduler paces inference; no fixed skip or sleep here
+        for outputs in engine.run():
             if not HEADLESS_MODE:
-                cv2.imshow("Parking Detection", detection_frame)
+                for camera_id, detection_frame in outputs.items():
+                    cv2.imshow(f"Parking Detection - {camera_id}", detection_frame)
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     break
 
-            current_time = time.time()
-            processing_time = current_time - last_time
-            sleep_time = max(1/target_fps - processing_time, 0)
-            time.sleep(sleep_time)
-            last_time = time.time()
-
     except Exception as e:
         print(f"Error in detection: {e}")
     finally:
         print("Cleaning up...")
-        vs.stop()
+        if engine is not None:
+            engine.stop()
+        if ocr_pool is not None:
+            ocr_pool.stop()
         if not HEADLESS_MODE:
             cv2.destroyAllWindows()
 
 def get_latest_frame():
-    with processing_lock:
-        return frame_buffer[-1] if frame_buffer else None
+    return frame_broadcaster.latest_frame()
 
 def capture_and_update_parking_slots():
     # Capture the latest frame from the camera
@@ -223,15 +344,9 @@ def capture_and_update_parking_slots():
 
 # Call this function periodically or based on your application logic
 
-# Emit notifications when parking status changes
-def notify_parking_status_change(spot_number, status):
-    socketio.emit('parking_status_update', {'spot_number': spot_number, 'status': status})
-
-# Update the parking state and notify users
-def update_parking_state(spot_number, plate):
-    parking_state.spots[spot_number]['status'] = 'occupied'
-    parking_state.spots[spot_number]['plate'] = plate
-    notify_parking_status_change(spot_number, {'status': 'occupied', 'plate': plate})
+# Update the parking state; its listeners push the change to dashboards
+def update_parking_state(spot_number, plate, state=parking_state):
+    return state.set_spot_plate(spot_number, plate)
 
 # In your detection logic, call update_parking_state when a spot status changes
 
@@ -246,7 +361,7 @@ def preprocess_image(frame):
 def process_frame_for_ocr(frame):
     """Preprocess the frame for OCR detection."""
     processed_frame = preprocess_image(frame)
-    detected_text = pytesseract.image_to_string(processed_frame, config='--psm 7')
+    detected_text = models.ocr_engine(OCR_LANGUAGES, MIN_OCR_CONFIDENCE).read_text(processed_frame, psm=7)
     return detected_text
 
 if __name__ == "__main__":
@@ -254,24 +369,15 @@ if __name__ == "__main__":
         sys.path.append(r"C:\vs_code\dp_21\dp_21")
         print("Starting Flask web server...")
         app = create_app()
-        
-        # Initialize SocketIO after app is created
-        socketio = SocketIO(app)
 
         app.secret_key = 'your-secret-key-here'
-        
-        # Define your routes here
-        @app.route('/update_parking_slots', methods=['POST'])
-        def update_parking_slots():
-            data = request.json
-            parking_state.update_spots_from_detection(data)
-            return jsonify({"status": "success", "message": "Parking slots updated."})
 
         detection_thread = threading.Thread(target=run_detection)
         detection_thread.daemon = True
         detection_thread.start()
         
         print("Flask app is running! Visit http://localhost:5000/parking for the UI")
-        app.run(debug=True, use_reloader=False, host='0.0.0.0', port=5000, threaded=True)
+        socketio.run(app, debug=True, use_reloader=False, host='0.0.0.0', port=5000,
+                     allow_unsafe_werkzeug=True)
     except Exception as e:
         print(f"Error starting application: {e}")
\ No newline at end of file
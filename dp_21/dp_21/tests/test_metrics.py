@@ -0,0 +1,30 @@
+from metrics import Registry
+
+
+def test_render_adds_child_process_exports():
+    parent, child = Registry(), Registry()
+    for registry in (parent, child):
+        registry.counter('frames_total', 'Frames')
+        registry.gauge('fps', 'Frame rate')
+        registry.histogram('stage_seconds', 'Stage time', buckets=(0.1, 1.0))
+
+    frames, fps, stage = parent.metrics
+    frames.inc(2, camera='a')
+    fps.set(10.0, camera='a')
+    stage.observe(0.05, stage='capture')
+
+    child_frames, child_fps, child_stage = child.metrics
+    child_frames.inc(3, camera='a')
+    child_fps.set(12.0, camera='a')
+    child_stage.observe(0.5, stage='capture')
+    parent.receive('capture-a-1', child.export())
+    # A newer export from the same source replaces the older one
+    child_frames.inc(1, camera='a')
+    parent.receive('capture-a-1', child.export())
+
+    lines = parent.render().splitlines()
+    assert 'frames_total{camera="a"} 6' in lines
+    assert 'fps{camera="a"} 12.0' in lines
+    assert 'stage_seconds_bucket{stage="capture",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="capture",le="1.0"} 2' in lines
+    assert 'stage_seconds_count{stage="capture"} 2' in lines
@@ -0,0 +1,59 @@
+import numpy as np
+
+from app.spot_store import SpotStore, OCCUPIED, EMPTY
+
+
+def observe(store, spot_id, occupied, now, confidence=0.9):
+    rows, _ = store.rows([spot_id])
+    return store.observe(rows, np.array([occupied]), np.array([confidence]), now)
+
+
+def test_observe_confirms_after_votes_and_dwell():
+    store = SpotStore([1, 2], window=5, votes=3, occupy_dwell=1.0, vacate_dwell=2.0)
+    changed = []
+    for step in range(6):
+        changed.extend(observe(store, 1, True, step * 0.5).tolist())
+    assert changed == [0]
+    assert store.status[0] == OCCUPIED
+    assert store.occupied == 1
+
+
+def test_force_clears_debounce_votes():
+    store = SpotStore([1], window=5, votes=3, occupy_dwell=0.0, vacate_dwell=0.0)
+    for step in range(6):
+        observe(store, 1, True, float(step))
+    assert store.status[0] == OCCUPIED
+
+    rows, _ = store.rows([1])
+    store.force(rows, np.array([False]), 10.0)
+    assert store.status[0] == EMPTY
+    assert not store.votes[0].any()
+
+    # One occupied frame after the force is a single vote, not N of M
+    assert len(observe(store, 1, True, 11.0)) == 0
+    assert store.status[0] == EMPTY
+
+
+def test_non_integer_spot_ids():
+    store = SpotStore(['A1', 'A2', 'B1'])
+    rows, valid = store.rows(['B1', 'C9', 'A1'])
+    assert valid.tolist() == [True, False, True]
+    assert [store.ids[row] for row in rows[valid]] == ['B1', 'A1']
+    assert store.row('A2') == 1
+    assert store.row('Z') is None
+
+
+def test_integer_ids_accept_numeric_strings():
+    store = SpotStore(np.array([3, 1, 2]))
+    assert store.ids == (1, 2, 3)
+    assert store.row('2') == 1
+    rows, valid = store.rows(['3', 'x'])
+    assert valid.tolist() == [True, False]
+    assert rows[0] == 2
+
+
+def test_steady_low_confidence_detection_becomes_occupied():
+    store = SpotStore([1], window=5, votes=3, occupy_dwell=1.0, vacate_dwell=2.0)
+    for step in range(10):
+        observe(store, 1, True, step * 0.5, confidence=0.55)
+    assert store.status[0] == OCCUPIED
@@ -0,0 +1,11 @@
+from app import create_app, socketio
+
+# Entry point for web-only workers, e.g.
+#   gunicorn -k eventlet -w 1 wsgi:app
+# Only the Flask app is imported here: no torch, ultralytics, EasyOCR or
+# OpenCV. Detectors run elsewhere (e.g. your_project/detection.py) and
+# push spot changes to /api/parking/ingest.
+app = create_app()
+
+if __name__ == "__main__":
+    socketio.run(app, host='0.0.0.0', port=5000)
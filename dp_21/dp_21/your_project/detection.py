@@ -1,11 +1,18 @@
 import cv2
+import numpy as np
 import torch
 from ultralytics import YOLO
 import time
 from threading import Thread
 import queue
-import requests
-import json
+import os
+import sys
+
+# Share the spot map implementation with the main detection package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection.spot_map import SpotMap
+from detection.ingest_client import ParkingIngestClient
+from detection.backends import results_to_array
 
 class VideoStream:
     def __init__(self, url):
@@ -45,21 +52,8 @@ class VideoStream:
         self.stopped = True
         self.stream.release()
 
-def update_parking_status(spot_id, status, number=None):
-    try:
-        data = {
-            spot_id: {
-                'status': 'occupied' if status == 'Occupied' else 'empty',
-                'number': number
-            }
-        }
-        response = requests.post('http://localhost:5000/update_parking', json=data)
-        if response.status_code == 200:
-            print(f"Successfully updated spot {spot_id}")
-        else:
-            print(f"Failed to update spot {spot_id}")
-    except Exception as e:
-        print(f"Error updating parking status: {e}")
+# Changes are coalesced and sent as one batch per interval over a kept-alive connection
+ingest_client = ParkingIngestClient('http://localhost:5000', source='your_project').start()
 
 # Initialize video stream
 vs = VideoStream(0).start()  # Use 0 for webcam or your video source URL
@@ -69,14 +63,16 @@ model = YOLO(r"weights/best.pt")
 model.to('cuda' if torch.cuda.is_available() else 'cpu')
 
 # Define parking spots (adjust coordinates based on your camera view)
+# Keys are the server's spot numbers
 parking_spots = {
-    "P1": {"coords": (100, 100, 200, 200)},
-    "P2": {"coords": (250, 100, 350, 200)},
-    "P3": {"coords": (400, 100, 500, 200)},
-    "P4": {"coords": (100, 250, 200, 350)},
-    "P5": {"coords": (250, 250, 350, 350)},
-    "P6": {"coords": (400, 250, 500, 350)},
+    1: {"coords": (100, 100, 200, 200)},
+    2: {"coords": (250, 100, 350, 200)},
+    3: {"coords": (400, 100, 500, 200)},
+    4: {"coords": (100, 250, 200, 350)},
+    5: {"coords": (250, 250, 350, 350)},
+    6: {"coords": (400, 250, 500, 350)},
 }
+spot_map = None  # Label raster built from parking_spots on the first frame
 
 try:
     while True:
@@ -89,26 +85,24 @@ try:
         with torch.no_grad():
             results = model(frame, verbose=False)
         
+        if spot_map is None:
+            spot_map = SpotMap.from_rectangles(
+                {spot_id: spot_data["coords"] for spot_id, spot_data in parking_spots.items()},
+                (frame.shape[1], frame.shape[0]))
+
+        # Pull boxes to numpy once, then assign them all to spots by their centres
+        detections, indices = spot_map.assign(results_to_array(results))
+        occupied = np.zeros(len(spot_map.spot_ids), dtype=bool)
+        occupied[indices] = detections[:, 5].astype(int) == 1  # 1 for occupied
+        # Here you could add number plate detection if needed
+
         # Process detections and update parking spots
-        for spot_id, spot_data in parking_spots.items():
-            spot_occupied = False
+        for spot_id, spot_occupied in zip(spot_map.spot_ids, occupied.tolist()):
+            spot_data = parking_spots[spot_id]
             car_number = None
-            
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    label = int(box.cls[0])
-                    
-                    # Check if detection is within this parking spot
-                    spot_x1, spot_y1, spot_x2, spot_y2 = spot_data["coords"]
-                    if (x1 >= spot_x1 and x2 <= spot_x2 and 
-                        y1 >= spot_y1 and y2 <= spot_y2):
-                        spot_occupied = (label == 1)  # 1 for occupied
-                        # Here you could add number plate detection if needed
-                        
-            # Update web interface
-            update_parking_status(spot_id, "Occupied" if spot_occupied else "Empty", car_number)
+
+            # Update web interface (only sent if the spot changed)
+            ingest_client.update(spot_id, spot_occupied, plate=car_number)
             
             # Draw on frame
             color = (0, 0, 255) if spot_occupied else (0, 255, 0)
@@ -126,4 +120,5 @@ except KeyboardInterrupt:
     print("Shutting down...")
 finally:
     vs.stop()
+    ingest_client.stop()
     cv2.destroyAllWindows() 
\ No newline at end of file